@@ -1,56 +1,89 @@
-from flask import Flask, request, jsonify
-import google.generativeai as genai
+from flask import Blueprint, Flask, request, jsonify
 import os
-from PIL import Image, ImageDraw
-import requests
 import io
 import json
-import psycopg2
-from dotenv import load_dotenv
+from datetime import date
 from flask_cors import CORS
-from news import da_news_scraper, generate_insights_from_text , rappler_news_scraper
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
-
-
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_NAME = os.getenv("DB_NAME")
-DB_HOST = os.getenv("DB_HOST")  # Cloud SQL Proxy uses localhost
-DB_PORT = os.getenv("DB_PORT")
+from db import db_connection, get_pool, pool_stats
+from migrations import migrate
+from response_cache import response_cache
+from governor import retry_after
+from llm_cache import generate_content, llm_cache, stream_content
+from sse import parse_json_answer, sse_event, sse_response, wants_stream
+from log_ingest import batch_max, insert_logs, parse_batch, validate_batch
+from pagination import decode_cursor, parse_limit
+from repositories import DemandRepository, NewsRepository, PlantAnalyticsRepository, latest_news
+from suggestions import combine_suggestions, current_suggestions, plan_suggestions, store_suggestion
+from demand import DIRECTIONS, legacy_payload, parse_demand
+import metrics
+import models
+from metrics import IMAGE_DECODE_SECONDS
+from jobs import enqueue, get_celery_app, get_job, job, setting
+
+
+_configured = False
+
+
+def configure():
+    """Load .env and configure the Gemini client. Safe to call more than once."""
+    global _configured
+    if _configured:
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it.")
+    models.configure(api_key)
+    _configured = True
+
+
+api = Blueprint("api", __name__)
+
+
+def create_app():
+    """Build the Flask app. Configuration and schema changes happen here, never on the request path."""
+    configure()
+    if os.getenv("RUN_MIGRATIONS", "1") == "1":
+        # A failed migration stops startup: later ones would never run and the
+        # app would serve a half-migrated schema. RUN_MIGRATIONS=0 skips them.
+        try:
+            migrate()
+        except Exception as e:
+            print(f"Error running migrations, not starting: {e}")
+            raise
 
+    app = Flask(__name__)
+    CORS(app)
+    metrics.init_app(app)
+    app.register_blueprint(api)
+    return app
 
 
-# Connect to the database
-def get_db_connection():
+def warm_up():
+    """Open the DB pool and build the model clients before the first request arrives."""
     try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        print("Connected to the database!")
-        return conn
+        get_pool()
     except Exception as e:
-        print(f"Error connecting to the database: {e}")
-        return None
+        print(f"Error opening the database pool: {e}")
+    models.warm_up()
 
 
-if not API_KEY:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it.")
-genai.configure(api_key=API_KEY)
-
-
-# Initialize Flask app
-app = Flask(__name__)
-CORS(app) 
+def __getattr__(name):
+    # Worker entry point when JOB_BACKEND=celery: celery -A app.celery_app worker.
+    # Built on first access, after configure() has loaded .env, so JOB_BACKEND may be set there.
+    if name == "celery_app":
+        configure()
+        return get_celery_app(setup=configure) if setting("JOB_BACKEND") == "celery" else None
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def load_image_from_url(image_url):
     """Loads an image from a URL and returns it as a PIL Image object."""
+    import requests
+    from PIL import Image
+
     try:
         response = requests.get(image_url)
         response.raise_for_status()
@@ -64,17 +97,16 @@ def load_image_from_url(image_url):
         print(f"Error opening image data: {e}")
         return None
 
-def generate_text_from_image_url(image_url, text_prompt):
+def generate_text_from_image_url(image_url, text_prompt, cache=False):
     """Fetches an image from a URL and uses it with the Gemini API."""
     image_part = load_image_from_url(image_url)
     if image_part is None:
         return {"error": "Failed to load image from URL."}
 
-    model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
     contents = [text_prompt, image_part]
 
     try:
-        response = model.generate_content(contents)
+        response = generate_content("diagnosis", contents, cache=cache)
         result = {"response": response.text}
 
         if response.prompt_feedback and response.prompt_feedback.block_reason:
@@ -86,13 +118,19 @@ def generate_text_from_image_url(image_url, text_prompt):
                 ]
         return result
     except Exception as e:
+        wait = retry_after(e)
+        if wait is not None:
+            return {"error": "The model is busy, please try again shortly", "retry_after": wait}
         return {"error": f"An API error occurred: {e}"}
-def generate_text_from_image(image_obj, text_prompt):
-    """Uses a PIL Image object with the Gemini API."""
-    model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
+def generate_text_from_image(image_obj, text_prompt, cache=False):
+    """Uses a PIL Image object with the Gemini API.
+
+    Not cached by default: a fresh photo never repeats, and keying it would
+    hash the whole decoded pixel buffer on the request path.
+    """
     contents = [text_prompt, image_obj]
     try:
-        response = model.generate_content(contents)
+        response = generate_content("diagnosis", contents, cache=cache)
         result = {"response": response.text}
         if response.prompt_feedback and response.prompt_feedback.block_reason:
             result["block_reason"] = response.prompt_feedback.block_reason
@@ -103,19 +141,44 @@ def generate_text_from_image(image_obj, text_prompt):
                 ]
         return result
     except Exception as e:
+        wait = retry_after(e)
+        if wait is not None:
+            return {"error": "The model is busy, please try again shortly", "retry_after": wait}
         return {"error": f"An API error occurred: {e}"}
 
-@app.route("/generate", methods=["POST"])
+def _stream_diagnosis(image_obj, text_prompt):
+    parts = []
+    try:
+        for text in stream_content("diagnosis", [text_prompt, image_obj], cache=False):
+            parts.append(text)
+            yield sse_event("chunk", {"text": text})
+    except Exception as e:
+        yield sse_event("error", {"error": f"An API error occurred: {e}"})
+        return
+    answer = "".join(parts)
+    yield sse_event("done", {"response": answer, "parsed": parse_json_answer(answer)})
+
+
+@api.route("/generate", methods=["POST"])
 def generate():
-    """API endpoint to generate text from an image URL and a text prompt."""
+    """API endpoint to generate text from an image URL and a text prompt.
+
+    With ?stream=1 (or Accept: text/event-stream) the diagnosis is streamed as
+    Server-Sent Events: `chunk` events with partial text, then a closing `done`
+    event carrying {"response": ..., "parsed": <the JSON object or null>}.
+    """
     if "image" not in request.files or "plant" not in request.form:
         return jsonify({"error": "Invalid request. 'image' and 'plant' are required."}), 400
 
+    from PIL import Image
+
     image_file = request.files["image"]
     plant_name = request.form["plant"]
     print("Received plant:", plant_name)
     try:
-        image = Image.open(image_file.stream)
+        with IMAGE_DECODE_SECONDS.time():
+            image = Image.open(image_file.stream)
+            image.load()
         text_prompt = f"""The plant is {plant_name}.
                         (examine carefully) first describe the image and then tell me what its disease is, its risk level (either low, medium or high), and the actions a farmer should take, using the following JSON format:
                         Example Output:
@@ -135,19 +198,41 @@ def generate():
                         "Respond only with the JSON object" and "Do not include any additional text or formatting like '''json ... '''".
                         """
         # ...existing code for text_prompt...
+        if wants_stream(request):
+            # Already decoded above, so the stream generator never touches the request body
+            return sse_response(_stream_diagnosis(image, text_prompt))
         result = generate_text_from_image(image, text_prompt)
-        
+        if "retry_after" in result:
+            return jsonify(result), 503, {"Retry-After": str(result["retry_after"])}
         return jsonify(result)
     except Exception as e:
         return jsonify({"error": f"An error occurred while processing the image: {e}"}), 500
 
 #
-@app.route("/")
+@api.route("/")
 def home():
     """Home route to test the API."""
     return jsonify({"message": "Welcome to the Gemini API Flask App!"})
 
 
+@api.route("/pool_stats", methods=["GET"])
+def get_pool_stats():
+    """Database pool size, checkout counts and wait times, for sizing DB_POOL_MAX."""
+    return jsonify(pool_stats()), 200
+
+
+@api.route("/cache_stats", methods=["GET"])
+def get_cache_stats():
+    """Response cache hit/miss counters."""
+    return jsonify(response_cache.stats()), 200
+
+
+@api.route("/llm_cache_stats", methods=["GET"])
+def get_llm_cache_stats():
+    """Gemini response cache hit ratio and tokens saved."""
+    return jsonify(llm_cache.stats()), 200
+
+
 
 
 
@@ -163,185 +248,245 @@ gcloud scheduler jobs create http daily-flask-task \
   --time-zone "Asia/Manila
 """
 
-#"https://apac-app-562528254517.asia-southeast1.run.app"
-@app.route("/daily_news", methods=['POST'])
-def daily_news():
+@job("daily_news")
+def run_daily_news():
     print("Running daily news task...")
-    da_news = da_news_scraper()
     #[description, url, title, image_url]
-    rappler_news = rappler_news_scraper()
-    print(da_news[1])
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
-
     try:
-        with conn.cursor() as cursor:
-            #cursor.execute(""" \d+ tablename""")
-            
-            cursor.execute("""
-                                INSERT INTO news (description, url, title, image_url)
-                                VALUES (%s, %s, %s, %s)
-                                ON CONFLICT (title) DO NOTHING
-                                """,
-            (da_news[0]["response"], da_news[1], da_news[2].strip(), da_news[3])
-        )
-            cursor.execute("""
-            INSERT INTO news (description, url, title, image_url)
-            VALUES (%s, %s, %s, %s)
-            ON CONFLICT (title) DO NOTHING
-            """,
-            (rappler_news[0]["response"], rappler_news[1], rappler_news[2].strip(), rappler_news[3])
-        )
-            conn.commit()
-
-        return jsonify({"message": "news added successfully"}), 201
+        # Scraper code (bs4 and friends) is only loaded by this job, not by the web process
+        from news import da_news_scraper, rappler_news_scraper
+        from scrape_job import run_sources
+
+        result = run_sources({
+            "da": da_news_scraper,
+            "rappler": rappler_news_scraper,
+        })
     except Exception as e:
-        print(f"Error inserting news: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
-       
-    
-        return 'Daily task executed', 200
-    
+        print(f"Error running daily news task: {e}")
+        return {"error": f"An error occurred: {e}"}, 500
+    print("Daily news task finished:", result)
+    if result["inserted"]:
+        response_cache.invalidate("news")
+    if not any(r["status"] in ("ok", "empty") for r in result["sources"].values()):
+        return {"error": "All news sources failed", **result}, 502
+    return {"message": "news added successfully", **result}, 201
+
+
+@job("weekly_suggestions")
+def generate_weekly_suggestion():
+    """Refresh the weekly suggestion of every plant that has new logs.
+
+    Plants whose logs are unchanged since their last suggestion keep it and
+    cost no model call.
     """
-    CREATE TABLE IF NOT EXISTS weekly_suggestions (
-    id SERIAL PRIMARY KEY,            
-    suggestion TEXT NOT NULL,          
-    created_at TIMESTAMP DEFAULT NOW(),
-);
+    with db_connection() as conn:
+        if conn is None:
+            return {"error": "Failed to connect to the database"}, 500
+
+        try:
+            items = plan_suggestions(conn)
+        except Exception as unexpected:
+            return {
+                "error": "An unexpected error occurred",
+                "details": str(unexpected)
+            }, 500
+        if not items:
+            return {"error": "No logs available to generate suggestions"}, 404
+
+        results, current, api_errors = [], [], []
+        for item in items:
+            if item["prompt"] is None:
+                results.append({"plant": item["plant"], "status": "unchanged"})
+                current.append(item["previous"])
+                continue
+
+            try:
+                response = generate_content("suggestions", [item["prompt"]])
+                suggestion_text = response.text.strip()
+            except Exception as api_err:
+                api_errors.append(api_err)
+                results.append({"plant": item["plant"], "status": "error", "details": str(api_err)})
+                if item["previous"]:
+                    current.append(item["previous"])
+                continue
+
+            try:
+                store_suggestion(conn, item, suggestion_text)
+                conn.commit()
+            except Exception as db_err:
+                return {
+                    "error": "Failed to store weekly suggestion",
+                    "details": str(db_err)
+                }, 500
+            results.append({"plant": item["plant"], "status": "generated"})
+            current.append({"plant": item["plant"], "suggestion": suggestion_text})
+
+    if any(r["status"] == "generated" for r in results):
+        response_cache.invalidate("weekly_suggestion")
+    if api_errors and len(api_errors) == sum(1 for item in items if item["prompt"] is not None):
+        return {
+            "error": "Failed to generate suggestions from Gemini API",
+            "details": str(api_errors[0]),
+            "plants": results,
+        }, 503 if retry_after(api_errors[0]) is not None else 502
+    generated = any(r["status"] == "generated" for r in results)
+    return {"suggestion": combine_suggestions(current), "plants": results}, 201 if generated else 200
+
+
+def stream_weekly_suggestion():
+    """Refresh weekly suggestions inline, relaying Gemini's output as Server-Sent Events.
+
+    Emits `chunk` events ({"plant", "text"}) for plants with new logs,
+    `unchanged` events ({"plant", "suggestion"}) for the rest, and a closing
+    `done` event with the combined {"suggestion": ...}, or an `error` event.
     """
-@app.route("/weekly_suggestions", methods=['GET'])
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
+        items = plan_suggestions(conn)
+    if not items:
+        return jsonify({"error": "No logs available to generate suggestions"}), 404
+
+    def events():
+        current = []
+        for item in items:
+            if item["prompt"] is None:
+                current.append(item["previous"])
+                yield sse_event("unchanged", {"plant": item["plant"], "suggestion": item["previous"]["suggestion"]})
+                continue
+
+            parts = []
+            try:
+                for text in stream_content("suggestions", [item["prompt"]]):
+                    parts.append(text)
+                    yield sse_event("chunk", {"plant": item["plant"], "text": text})
+            except Exception as api_err:
+                yield sse_event("error", {
+                    "error": "Failed to generate suggestions from Gemini API",
+                    "details": str(api_err)
+                })
+                return
+
+            suggestion_text = "".join(parts).strip()
+            try:
+                with db_connection() as conn:
+                    if conn is None:
+                        raise RuntimeError("Failed to connect to the database")
+                    store_suggestion(conn, item, suggestion_text)
+                    conn.commit()
+            except Exception as db_err:
+                yield sse_event("error", {"error": "Failed to store weekly suggestion", "details": str(db_err)})
+                return
+            response_cache.invalidate("weekly_suggestion")
+            current.append({"plant": item["plant"], "suggestion": suggestion_text})
+        yield sse_event("done", {"suggestion": combine_suggestions(current)})
+
+    return sse_response(events())
+
+
+
+
+
+#"https://apac-app-562528254517.asia-southeast1.run.app"
+@api.route("/daily_news", methods=['POST'])
+def daily_news():
+    """Queue the daily news scrape; poll /jobs/<job_id> for the result."""
+    return _queued(enqueue("daily_news", dedupe_key="daily_news:" + date.today().isoformat()))
+
+
+@api.route("/weekly_suggestions", methods=['GET'])
 def weekly_suggestions():
-    """API endpoint to generate weekly suggestions."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    """Queue weekly suggestion generation; poll /jobs/<job_id> for the result.
 
-    try:
-        # 1) Fetch latest 10 logs
-        with conn.cursor() as cursor:
-            cursor.execute("""
-                SELECT plant, log_date, watered, fertilizer_applied,
-                       disease, height_cm, growth_stage, note
-                FROM plant_log
-                ORDER BY log_date DESC
-                LIMIT 10
-            """)
-            rows = cursor.fetchall()
-
-        if not rows:
-            return jsonify({"error": "No logs available to generate suggestions"}), 404
-
-        logs = [
-            {
-                "plant": r[0],
-                "log_date": r[1].isoformat() if hasattr(r[1], "isoformat") else str(r[1]),
-                "watered": r[2],
-                "fertilizer_applied": r[3],
-                "disease": r[4],
-                "height_cm": float(r[5]) if r[5] is not None else None,
-                "growth_stage": r[6],
-                "note": r[7],
-            }
-            for r in rows
-        ]
-
-        # 2) Build prompt
-        prompt = (
-            f"""
-            you are a plant expert and given this data below, what suggestions can you give to optimize plant growth, only put the action steps and skip the explanations, limit to 10 words per sentence, use bullet points, and do not add necessary sentences like "Here is a step-by-step plan to optimize growth"
-            f"{json.dumps(logs, indent=2)}\n"
-            """
-           
-        )
-
-        # 3) Call Gemini API
-        try:
-            model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
-            response = model.generate_content([prompt])
-            suggestion_text = response.text.strip()
-        except Exception as api_err:
-            return jsonify({
-                "error": "Failed to generate suggestions from Gemini API",
-                "details": str(api_err)
-            }), 502
-
-        # 4) Store suggestion
-        try:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO weekly_suggestions (suggestion)
-                    VALUES (%s)
-                """, (suggestion_text,))
-            conn.commit()
-        except Exception as db_err:
-            return jsonify({
-                "error": "Failed to store weekly suggestion",
-                "details": str(db_err)
-            }), 500
+    With ?stream=1 (or Accept: text/event-stream) it is generated inline and streamed instead.
+    """
+    if wants_stream(request):
+        return stream_weekly_suggestion()
+    # Only collapse concurrent requests: the app calls this right after /post_logs, and
+    # a rerun is cheap because plants whose logs did not change reuse their suggestion
+    return _queued(enqueue("weekly_suggestions", dedupe_key="weekly_suggestions", keep_for=0))
+
+
+@api.route("/post_demand", methods=["POST"])
+def post_demand():
+    """Queue demand generation; poll /jobs/<job_id> for the result."""
+    return _queued(enqueue("post_demand", dedupe_key="post_demand"))
 
-        return jsonify({"suggestion": suggestion_text}), 201
 
-    except Exception as unexpected:
-        return jsonify({
-            "error": "An unexpected error occurred",
-            "details": str(unexpected)
-        }), 500
+def _queued(record):
+    """202 response pointing the caller at /jobs/<job_id>."""
+    return jsonify({
+        "job_id": record["id"],
+        "status": record["status"],
+        "status_url": f"/jobs/{record['id']}",
+        "deduplicated": record.get("deduplicated", False),
+    }), 202
 
-    finally:
-        conn.close()
 
+@api.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Status, and once finished the result, of a queued job."""
+    record = get_job(job_id)
+    if record is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(record), 200
 
 
-@app.route("/get_weekly_suggestion", methods=['GET'])
+
+@api.route("/get_weekly_suggestion", methods=['GET'])
+@response_cache.cached("weekly_suggestion")
 def get_weekly_suggestions():
-    """API endpoint to retrieve all weekly suggestions from the database."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    """API endpoint to retrieve the current weekly suggestion.
 
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id, suggestion FROM weekly_suggestions ORDER BY created_at DESC LIMIT 1;")
-            row = cursor.fetchone()
-            suggestions = {"id": row[0], "suggestion": row[1]} if row else None
-            print("suggestions", suggestions)
-        if not suggestions:
-            return jsonify({"message": "No suggestions available"}), 404
-        return jsonify(suggestions), 200
-    except Exception as e:
-        print(f"Error retrieving suggestions: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
+    `suggestion` combines the newest suggestion of every plant; `plants` lists them separately.
+    """
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
+
+        try:
+            suggestions = current_suggestions(conn)
+            if not suggestions:
+                return jsonify({"message": "No suggestions available"}), 404
+            return jsonify(suggestions), 200
+        except Exception as e:
+            print(f"Error retrieving suggestions: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
 
 
 
 
-@app.route("/get_news", methods=['GET'])
+@api.route("/get_news", methods=['GET'])
+@response_cache.cached("news")
 def get_news():
-    """API endpoint to retrieve all news from the database."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    """API endpoint to retrieve news from the database, newest first.
 
+    Without query parameters this returns the latest 20 articles as a list.
+    With `limit`, `cursor` or `fields` it returns a page
+    {"items": [...], "next_cursor": ...}; pass `next_cursor` back as `cursor`
+    for the next page, and `fields=summary` to leave out `description`.
+    """
+    paged = any(arg in request.args for arg in ("limit", "cursor", "fields"))
+    include_description = request.args.get("fields", "full") != "summary"
     try:
-        with conn.cursor() as cursor:
-          
-            cursor.execute("SELECT id, description, url,title,image_url FROM news ORDER BY created_at DESC LIMIT 20;")
-            rows = cursor.fetchall()
-            news = [
-                {"id": row[0], "description": row[1],"url": row[2],"title":row[3],"image_url":row[4]} for row in rows
-            ]
-        return jsonify(news), 200
-    except Exception as e:
-        print(f"Error retrieving plan: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
-@app.route("/post_logs", methods=['POST'])
+        limit = parse_limit(request.args.get("limit"))
+        after = decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
+
+        try:
+            news, next_cursor = NewsRepository(conn).page(limit, after, include_description)
+            if not paged:
+                return jsonify(news), 200
+            return jsonify({"items": news, "next_cursor": next_cursor}), 200
+        except Exception as e:
+            print(f"Error retrieving plan: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+@api.route("/post_logs", methods=['POST'])
 def post_logs():
     """API endpoint to add logs to the database."""
     data = request.get_json()
@@ -364,66 +509,138 @@ def post_logs():
     if not plant:
         return jsonify({"error": "Plant name is required"}), 400
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
 
-    try:
-        with conn.cursor() as cursor:
-            #ursor.execute("ALTER TABLE plant_log ADD COLUMN note TEXT;")
-            cursor.execute("""
-    CREATE TABLE IF NOT EXISTS plant_log ( 
-        id SERIAL PRIMARY KEY, 
-        plant TEXT,
-        log_date TIMESTAMP DEFAULT NOW(), 
-        watered BOOLEAN DEFAULT FALSE, 
-        fertilizer_applied TEXT, 
-        disease TEXT,
-        height_cm NUMERIC(5,2), 
-        growth_stage TEXT
-    );
-""")
-            
-            cursor.execute("""
-                INSERT INTO plant_log (plant, watered, fertilizer_applied, height_cm, disease, growth_stage,note)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """, (plant, watered, fertilizer_applied, height_cm, disease, growth_stage, note.strip()))
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO plant_log (plant, watered, fertilizer_applied, height_cm, disease, growth_stage,note)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                """, (plant, watered, fertilizer_applied, height_cm, disease, growth_stage, note.strip()))
             
             
-            conn.commit()
-        return jsonify({"message": "Logs added successfully"}), 201
-    except Exception as e:
-        print(f"Error inserting logs: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
+                conn.commit()
+            response_cache.invalidate("analytics")
+            return jsonify({"message": "Logs added successfully"}), 201
+        except Exception as e:
+            print(f"Error inserting logs: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+
+@api.route("/post_logs/batch", methods=['POST'])
+def post_logs_batch():
+    """API endpoint to add many logs at once, e.g. a day of offline entries.
+
+    Accepts a JSON array or an NDJSON body of objects shaped like /post_logs,
+    plus an optional ISO 8601 `log_date` that must carry a UTC offset.
+    Valid logs are written in one transaction; the response has a result
+    per input row, in order.
+    """
+    try:
+        entries = parse_batch(request.get_data(), request.content_type)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid request body: {e}"}), 400
+    if not entries:
+        return jsonify({"error": "No logs provided"}), 400
+    if len(entries) > batch_max():
+        return jsonify({"error": f"At most {batch_max()} logs per batch"}), 413
+
+    rows, results = validate_batch(entries)
+    if not rows:
+        return jsonify({"inserted": 0, "results": results}), 400
+
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
 
-@app.route("/get_logs", methods=['GET'])
+        try:
+            ids = iter(insert_logs(conn, rows))
+        except Exception as e:
+            print(f"Error inserting logs: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+    response_cache.invalidate("analytics")
+
+    for result in results:
+        if result["status"] == "pending":
+            result.update(status="created", id=next(ids))
+    status = 201 if len(rows) == len(entries) else 207
+    return jsonify({"inserted": len(rows), "results": results}), status
+
+@api.route("/get_logs", methods=['GET'])
 def get_logs():
     """API endpoint to retrieve all logs from the database."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
 
-    try:
-        with conn.cursor() as cursor:
+        try:
+            with conn.cursor() as cursor:
           
-            cursor.execute(
-                    "SELECT id, plant, log_date, watered, fertilizer_applied, disease, height_cm, growth_stage, note"
-                    " FROM plant_log ORDER BY log_date DESC LIMIT 10;"
-                )
-            rows = cursor.fetchall()
-            logs = [
-                {"id": row[0], "plant": row[1], "log_date": row[2], "watered": row[3], "fertilizer_applied": row[4], "disease": row[5], "height_cm": row[6], "growth_stage": row[7],"note": row[8]} for row in rows
-            ]
-            print(logs)
-        return jsonify(logs), 200
-    except Exception as e:
-        print(f"Error retrieving logs: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
-@app.route("/add_plant", methods=["POST"])
+                cursor.execute(
+                        "SELECT id, plant, log_date, watered, fertilizer_applied, disease, height_cm, growth_stage, note"
+                        " FROM plant_log ORDER BY log_date DESC LIMIT 10;"
+                    )
+                rows = cursor.fetchall()
+                logs = [
+                    {"id": row[0], "plant": row[1], "log_date": row[2], "watered": row[3], "fertilizer_applied": row[4], "disease": row[5], "height_cm": row[6], "growth_stage": row[7],"note": row[8]} for row in rows
+                ]
+                print(logs)
+            return jsonify(logs), 200
+        except Exception as e:
+            print(f"Error retrieving logs: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+def _analytics_days():
+    """The ?days= window for analytics routes (default 90, at most 10 years)."""
+    value = request.args.get("days", "")
+    days = int(value) if value else 90
+    if days < 1:
+        raise ValueError("days must be a positive integer")
+    return min(days, 3650)
+
+
+@api.route("/plant_analytics", methods=["GET"])
+@response_cache.cached("analytics")
+def get_plant_analytics_overview():
+    """Growth, watering and disease summary for every plant logged in the last ?days= days."""
+    try:
+        days = _analytics_days()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
+        try:
+            return jsonify({"days": days, "plants": PlantAnalyticsRepository(conn).overview(days)}), 200
+        except Exception as e:
+            print(f"Error computing plant analytics: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+
+
+@api.route("/plant_analytics/<path:plant>", methods=["GET"])
+@response_cache.cached("analytics")
+def get_plant_analytics(plant):
+    """Growth rate, watering frequency, weekly disease incidence and stage progression for one plant."""
+    try:
+        days = _analytics_days()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
+        try:
+            analytics = PlantAnalyticsRepository(conn).plant(plant, days)
+        except Exception as e:
+            print(f"Error computing plant analytics: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+    if analytics is None:
+        return jsonify({"message": f"No logs for {plant} in the last {days} days"}), 404
+    return jsonify(analytics), 200
+
+
+@api.route("/add_plant", methods=["POST"])
 def add_plant():
     """API endpoint to add a plant to the database."""
     data = request.get_json()
@@ -433,49 +650,43 @@ def add_plant():
     if not plant_name:
         return jsonify({"error": "Plant name is required"}), 400
 
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
 
-    try:
-        with conn.cursor() as cursor:
-            
-            cursor.execute("""
-                 
-            """)
-            cursor.execute(
-                "INSERT INTO plants (name) VALUES (%s)",
-                (plant_name,)
-            )
-            conn.commit()
-        return jsonify({"message": "Plant added successfully"}), 201
-    except Exception as e:
-        print(f"Error inserting plant: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO plants (name) VALUES (%s)",
+                    (plant_name,)
+                )
+                conn.commit()
+            response_cache.invalidate("plants")
+            return jsonify({"message": "Plant added successfully"}), 201
+        except Exception as e:
+            print(f"Error inserting plant: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
 
 
-@app.route("/get_plant", methods=["GET"])
+@api.route("/get_plant", methods=["GET"])
+@response_cache.cached("plants")
 def get_plant():
     """API endpoint to retrieve all plants from the database."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
 
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id, name FROM plants")
-            rows = cursor.fetchall()
-            plants = [
-                {"id": row[0], "name": row[1]} for row in rows
-            ]
-        return jsonify(plants), 200
-    except Exception as e:
-        print(f"Error retrieving plants: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT id, name FROM plants")
+                rows = cursor.fetchall()
+                plants = [
+                    {"id": row[0], "name": row[1]} for row in rows
+                ]
+            return jsonify(plants), 200
+        except Exception as e:
+            print(f"Error retrieving plants: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
 
 def generate_demand():
     text_prompt = (
@@ -490,15 +701,13 @@ def generate_demand():
         "the current price but for the price do not be limited by the data I gave. "
         "Lastly, do not put the news ID where the sentiment came from."
     )
-    res = requests.get("https://apac-app-562528254517.asia-southeast1.run.app/get_news")
-    if res.ok and res.text:
-        try:
-            result = res.json()
-        except json.JSONDecodeError:
-            result = {"error": "Invalid JSON from news endpoint"}
-    else:
-        model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
-        response = model.generate_content([text_prompt])
+    try:
+        result = latest_news(20)
+    except Exception as e:
+        print(f"Error fetching news: {e}")
+        result = None
+    if not result:
+        response = generate_content("demand", [text_prompt])
         text = response.text.replace("```json", "").replace("```", "").strip()
         result = {"response": text}
         with open('temp.json', 'w') as f:
@@ -519,24 +728,19 @@ def generate_demand_final():
         "the current price but for the price do not be limited by the data I gave. "
         "Lastly, do not put the news ID where the sentiment came from."
     )
-    url = "http://127.0.0.1:5000/get_news"  # Correctly define the URL for fetching news
-
     try:
-        # Fetch the latest 20 news articles
-        response = requests.get(url)
-        response.raise_for_status()  # Raise an error for HTTP issues
-        news_data = response.json()
+        # Fetch the latest 20 news articles straight from the database
+        news_data = latest_news(20)
 
-        if not news_data or not isinstance(news_data, list):
-            raise ValueError("Invalid news data received from the API")
+        if not news_data:
+            raise ValueError("No news available to generate demand from")
 
         # Append the news data to the prompt
         text_prompt += "\n" + json.dumps(news_data, indent=2)
 
         # Call the Gemini API to generate demand
-        model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
         contents = [text_prompt]
-        response = model.generate_content(contents)
+        response = generate_content("demand", contents, generation_config={"response_mime_type": "application/json"})
 
         # Clean up the response text
         temp = response.text
@@ -546,64 +750,105 @@ def generate_demand_final():
         result = {"response": cleaned_response}
         return result
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error fetching news: {e}")
-        return None
     except Exception as e:
         print(f"Error generating demand: {e}")
         return None
-@app.route("/post_demand", methods=["POST"])
-def post_demand():
-    """API endpoint to add demand to the database."""
+@job("post_demand")
+def store_demand():
+    """Generate demand from the latest news and store it."""
     demand = generate_demand_final()
 
     if not demand or "response" not in demand:
-        return jsonify({"error": "Failed to generate demand"}), 500
-
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+        return {"error": "Failed to generate demand"}, 500
 
+    # Parse and validate once here so readers get ready-to-use JSON
     try:
-        with conn.cursor() as cursor:
-            # Create the demand table if it doesn't exist
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS demand ( 
-                    id SERIAL PRIMARY KEY, 
-                    json TEXT
-                );
-            """)
-            # Insert the generated demand into the database
-            cursor.execute(
-                "INSERT INTO demand (json) VALUES (%s)",
-                (json.dumps(demand),)
-            )
+        document = parse_demand(demand["response"])
+    except ValueError as e:
+        return {"error": "Gemini returned an unusable demand document", "details": str(e)}, 502
+
+    with db_connection() as conn:
+        if conn is None:
+            return {"error": "Failed to connect to the database"}, 500
+
+        try:
+            snapshot_id = DemandRepository(conn).add_snapshot(document)
             conn.commit()
-        return jsonify({"message": "Demand added successfully"}), 201
-    except Exception as e:
-        print(f"Error inserting demand: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
-@app.route("/get_demand", methods=["GET"])
+            response_cache.invalidate("demand")
+            return {"message": "Demand added successfully", "id": snapshot_id}, 201
+        except Exception as e:
+            print(f"Error inserting demand: {e}")
+            return {"error": f"An error occurred: {e}"}, 500
+@api.route("/get_demand", methods=["GET"])
+@response_cache.cached("demand")
 def get_demand():
-    """API endpoint to retrieve the latest demand from the database."""
-    conn = get_db_connection()
-    if conn is None:
-        return jsonify({"error": "Failed to connect to the database"}), 500
+    """API endpoint to retrieve the latest demand from the database.
 
-    try:
-        with conn.cursor() as cursor:
-            cursor.execute("SELECT id, json FROM demand ORDER BY id DESC LIMIT 1;")
-            row = cursor.fetchone()
-            if not row:
+    Returns {id, created_at, increasing: [{crop, price, analysis}], decreasing: [...]}.
+    `json` repeats the document in the old double-encoded form for older app builds.
+    With ?crop= and/or ?direction=increasing|decreasing only the matching
+    crops are returned (and no `json`).
+    """
+    crop = request.args.get("crop", "").strip()
+    direction = request.args.get("direction", "").strip().lower()
+    if direction and direction not in DIRECTIONS:
+        return jsonify({"error": "direction must be 'increasing' or 'decreasing'"}), 400
+
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
+
+        try:
+            repo = DemandRepository(conn)
+            snapshot = repo.latest()
+            if not snapshot:
                 return jsonify({"message": "No demand available"}), 404
-            demand = {"id": row[0], "json": row[1]}
-        return jsonify(demand), 200
-    except Exception as e:
-        print(f"Error retrieving demand: {e}")
-        return jsonify({"error": f"An error occurred: {e}"}), 500
-    finally:
-        conn.close()
+            if snapshot["document"] is None:
+                # Stored before demand was parsed at write time
+                if crop or direction:
+                    return jsonify({"message": "No structured demand available"}), 404
+                return jsonify({"id": snapshot["id"], "json": snapshot["json"]}), 200
+
+            demand = {
+                "id": snapshot["id"],
+                "created_at": snapshot["created_at"].isoformat() if snapshot["created_at"] else None,
+            }
+            if crop or direction:
+                for key in ([direction] if direction else DIRECTIONS):
+                    demand[key] = []
+                for item in repo.prices(snapshot["id"], crop or None, direction or None):
+                    demand[item.pop("direction")].append(item)
+            else:
+                demand.update(snapshot["document"])
+                demand["json"] = legacy_payload(snapshot["document"])
+            return jsonify(demand), 200
+        except Exception as e:
+            print(f"Error retrieving demand: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+
+
+@api.route("/crop_prices", methods=["GET"])
+@response_cache.cached("demand")
+def get_crop_prices():
+    """Price history of one crop across demand snapshots: /crop_prices?crop=rice&limit=20."""
+    crop = request.args.get("crop", "").strip()
+    if not crop:
+        return jsonify({"error": "crop is required"}), 400
+    try:
+        limit = parse_limit(request.args.get("limit"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    with db_connection() as conn:
+        if conn is None:
+            return jsonify({"error": "Failed to connect to the database"}), 500
+        try:
+            return jsonify({"crop": crop, "items": DemandRepository(conn).history(crop, limit)}), 200
+        except Exception as e:
+            print(f"Error retrieving crop prices: {e}")
+            return jsonify({"error": f"An error occurred: {e}"}), 500
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    # Development server only; production runs gunicorn -c gunicorn.conf.py
+    create_app().run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEBUG", "1") == "1")
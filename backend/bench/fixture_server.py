@@ -0,0 +1,117 @@
+"""Serves the recorded news pages in bench/fixtures so the scrapers run offline.
+
+Listing pages and articles are templates: `{page}`, `{next_page}` and `{n}`
+are filled in from the request path, so every page and article is distinct
+while the HTML stays the same. Listing pages past --pages answer 404.
+
+    python bench/fixture_server.py --port 8765        # from backend/
+    SCRAPER_HOST_OVERRIDES='{"www.da.gov.ph": "http://127.0.0.1:8765",
+                             "www.rappler.com": "http://127.0.0.1:8765"}' python news.py
+
+http_client keeps the request path when it rewrites a host, so one server
+can stand in for every source.
+"""
+import argparse
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+HOSTS = ["www.da.gov.ph", "www.rappler.com"]
+
+# (path pattern, fixture); the groups are page and (for articles) n
+ROUTES = [
+    (re.compile(r"^/category/news/(?:page/(\d+)/)?$"), "da/listing.html"),
+    (re.compile(r"^/bench-da-article-(\d+)-(\d+)/$"), "da/article.html"),
+    (re.compile(r"^/topic/agriculture-philippines/(?:page/(\d+)/)?$"), "rappler/listing.html"),
+    (re.compile(r"^/philippines/bench-rappler-article-(\d+)-(\d+)/$"), "rappler/article.html"),
+]
+
+_templates = {}
+
+
+def _template(name):
+    if name not in _templates:
+        with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+            _templates[name] = f.read()
+    return _templates[name]
+
+
+def render(path, max_pages):
+    """The fixture body for `path`, or None if nothing is recorded for it."""
+    path = path.split("?", 1)[0]
+    for pattern, name in ROUTES:
+        match = pattern.match(path)
+        if not match:
+            continue
+        page = int(match.group(1) or 1)
+        n = match.group(2) if pattern.groups > 1 else ""
+        if page > max_pages:
+            return None
+        # Plain replace: the pages carry CSS and JSON braces that str.format would choke on
+        return (_template(name)
+                .replace("{page}", str(page))
+                .replace("{next_page}", str(page + 1))
+                .replace("{n}", n))
+    return None
+
+
+def make_handler(max_pages, delay=0.0):
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if delay:
+                threading.Event().wait(delay)
+            body = render(self.path, max_pages)
+            if body is None:
+                self.send_error(404)
+                return
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+def start(port=0, max_pages=10, delay=0.0):
+    """Start the server on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(max_pages, delay))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fixture-server", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def route_scrapers(base_url):
+    """Point the scrapers of this process at the fixture server."""
+    import http_client
+
+    for host in HOSTS:
+        http_client.set_host_override(host, base_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=10, help="listing pages per source before 404")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds to wait before each response")
+    args = parser.parse_args()
+
+    server, base_url = start(args.port, args.pages, args.delay)
+    print(f"Serving {FIXTURES_DIR} at {base_url} for {', '.join(HOSTS)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Import-time regression check for the web process.
+
+Imports `app` in fresh interpreters, reports the median wall time and the
+slowest modules from `python -X importtime`, and fails if it is over budget or
+if a module that should load lazily was pulled in at import time.
+
+    python bench/import_time.py                  # from backend/
+    python bench/import_time.py --runs 10 --budget-ms 400 --top 15
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported just by importing the app; each loads on first use
+LAZY_MODULES = [
+    "google.generativeai",
+    "google.api_core",
+    "grpc",
+    "PIL",
+    "psycopg2",
+    "bs4",
+    "selenium",
+    "news",
+    "celery",
+    "dotenv",
+    "fake_gemini",
+    "redis",
+]
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "modules": sorted(sys.modules)}}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    # Importing the app must not need real credentials
+    env.setdefault("GOOGLE_API_KEY", "import-time-benchmark")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def measure(module):
+    """Wall time and loaded modules for one cold import of `module`."""
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module)],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(module, top):
+    """(cumulative_us, name) for the `top` slowest imports according to -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        # "import time:       123 |       4567 |   some.module"
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "0")),
+                        help="fail if the median import is slower (0 disables)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    samples = [measure(args.module) for _ in range(args.runs)]
+    median_ms = statistics.median(s["seconds"] for s in samples) * 1000
+    loaded = set(samples[-1]["modules"])
+
+    print(f"import {args.module}: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {min(s['seconds'] for s in samples) * 1000:.1f} ms, {len(loaded)} modules)")
+    print("\nSlowest imports (cumulative):")
+    for cumulative_us, name in slowest_imports(args.module, args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failures = []
+    eager = [name for name in LAZY_MODULES if name in loaded]
+    if eager:
+        failures.append("loaded at import time but should be lazy: " + ", ".join(eager))
+    if args.budget_ms and median_ms > args.budget_ms:
+        failures.append(f"median {median_ms:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print("\nFAIL: " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
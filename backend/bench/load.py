@@ -0,0 +1,309 @@
+"""Offline load test: every endpoint against a real Postgres, with no network.
+
+Gemini is replaced by fake_gemini (GEMINI_FAKE=1) and the news sites by
+bench/fixture_server.py. Jobs run inline (JOB_BACKEND=eager), so /daily_news,
+/weekly_suggestions and /post_demand measure the whole job. The app is served
+in-process by a threaded werkzeug server unless --url points at one already
+running (e.g. gunicorn started with the same environment, GEMINI_FAKE=1 and
+SCRAPER_HOST_OVERRIDES aimed at a separate bench/fixture_server.py).
+
+It writes rows, so point DB_HOST/DB_PORT/DB_USER/DB_PASSWORD/DB_NAME at a
+throwaway database; a disposable one can be started with
+
+    docker run --rm -d -p 5433:5432 -e POSTGRES_PASSWORD=bench postgres:15
+    DB_HOST=127.0.0.1 DB_PORT=5433 DB_USER=postgres DB_PASSWORD=bench DB_NAME=postgres \\
+        python bench/load.py --duration 10 --concurrency 8 --json bench-new.json
+
+Every scenario runs for --duration seconds with --concurrency closed-loop
+clients. The report has p50/p95/p99, requests/s and errors per endpoint.
+The LLM cache is off (LLM_CACHE_ENABLED=0), since repeating one prompt would
+otherwise measure cache hits; the scenarios in CACHED_SCENARIOS run a second
+time with it on and are reported as "<name>:cached". With --url the server's
+own environment decides, so set LLM_CACHE_ENABLED=0 there and the cached
+variants are skipped.
+With --baseline, a run whose p95 grew or whose throughput shrank by more than
+--max-regression (a fraction) exits 1.
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_gemini import DEFAULT_TEXT as FAKE_TEXT  # noqa: E402
+
+BENCH_PLANTS = ["bench-tomato", "bench-eggplant", "bench-pechay"]
+BENCH_ADDED_PLANT = "bench-added"
+# Jobs whose prompts go through the LLM cache
+CACHED_SCENARIOS = ("weekly_suggestions", "daily_news", "post_demand")
+
+
+def _bench_env(args):
+    """Environment for an offline run; anything already set by the caller wins."""
+    scratch = tempfile.mkdtemp(prefix="apac-bench-")
+    defaults = {
+        "GOOGLE_API_KEY": "bench",
+        "GEMINI_FAKE": "1",
+        "FAKE_GEMINI_LATENCY": str(args.llm_latency),
+        "JOB_BACKEND": "eager",
+        # Let every iteration of a job scenario run the job instead of deduplicating
+        "JOB_DEDUPE_SECONDS": "0",
+        "HTTP_CACHE_DIR": os.path.join(scratch, "http"),
+        "LLM_CACHE_PATH": os.path.join(scratch, "llm_cache.sqlite"),
+        "FLASK_DEBUG": "0",
+        "RUN_MIGRATIONS": "1",
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+    # Not a default: the plain scenarios must measure the model path
+    os.environ["LLM_CACHE_ENABLED"] = "0"
+
+
+def seed(logs_per_plant, news_rows):
+    """Plants, a history of logs, news and one demand snapshot to read back."""
+    from db import db_connection
+    from demand import parse_demand
+    from repositories import DemandRepository
+
+    with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("Failed to connect to the database; check the DB_* settings")
+        with conn.cursor() as cursor:
+            # Left by the add_plant scenario of earlier runs
+            cursor.execute("DELETE FROM plants WHERE name = %s", (BENCH_ADDED_PLANT,))
+            for plant in BENCH_PLANTS:
+                cursor.execute("SELECT 1 FROM plants WHERE name = %s", (plant,))
+                if cursor.fetchone() is None:
+                    cursor.execute("INSERT INTO plants (name) VALUES (%s)", (plant,))
+            cursor.execute("SELECT COUNT(*) FROM plant_log WHERE plant = ANY(%s)", (BENCH_PLANTS,))
+            if cursor.fetchone()[0] < logs_per_plant * len(BENCH_PLANTS):
+                # One log every 6 hours going back from now
+                cursor.execute("""
+                    INSERT INTO plant_log (plant, log_date, watered, fertilizer_applied, disease,
+                                           height_cm, growth_stage, note)
+                    SELECT p.plant, NOW() - (g * INTERVAL '6 hours'), g %% 2 = 0,
+                           CASE WHEN g %% 7 = 0 THEN 'urea' END,
+                           CASE WHEN g %% 11 = 0 THEN 'leaf spot' END,
+                           5 + (%s - g) * 0.05,
+                           CASE WHEN g > %s * 2 / 3 THEN 'seedling' WHEN g > %s / 3 THEN 'vegetative' ELSE 'flowering' END,
+                           'bench'
+                    FROM unnest(%s::text[]) AS p(plant), generate_series(1, %s) AS g
+                """, (logs_per_plant, logs_per_plant, logs_per_plant, BENCH_PLANTS, logs_per_plant))
+            cursor.execute("""
+                INSERT INTO news (description, url, url_key, title, image_url)
+                SELECT 'Bench insight ' || g, 'https://bench.invalid/news/' || g, 'https://bench.invalid/news/' || g,
+                       'Bench article ' || g, 'https://bench.invalid/img/' || g || '.jpg'
+                FROM generate_series(1, %s) AS g
+                ON CONFLICT (title) DO NOTHING
+            """, (news_rows,))
+        DemandRepository(conn).add_snapshot(parse_demand(FAKE_TEXT))
+        conn.commit()
+
+
+def _png():
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), (40, 140, 60)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _job_failed(response):
+    try:
+        return response.json().get("status") == "failed"
+    except ValueError:
+        return True
+
+
+def scenarios():
+    """name -> (method, path, request kwargs, extra failure check)."""
+    image = _png()
+    log = {"plant": BENCH_PLANTS[0], "watered": True, "fertilizer": "", "height": 42.5,
+           "disease": "", "stage": "vegetative", "note": "bench"}
+    return {
+        "get_news": ("GET", "/get_news", {}, None),
+        "get_news_page": ("GET", "/get_news?limit=20", {}, None),
+        "get_plant": ("GET", "/get_plant", {}, None),
+        "get_logs": ("GET", "/get_logs", {}, None),
+        "get_weekly_suggestion": ("GET", "/get_weekly_suggestion", {}, None),
+        "get_demand": ("GET", "/get_demand", {}, None),
+        "get_demand_filtered": ("GET", "/get_demand?direction=increasing", {}, None),
+        "crop_prices": ("GET", "/crop_prices?crop=Rice", {}, None),
+        "plant_analytics": ("GET", "/plant_analytics", {}, None),
+        "plant_analytics_plant": ("GET", "/plant_analytics/" + BENCH_PLANTS[0], {}, None),
+        "metrics": ("GET", "/metrics", {}, None),
+        "post_logs": ("POST", "/post_logs", {"json": log}, None),
+        "post_logs_batch": ("POST", "/post_logs/batch", {"json": [dict(log, plant=p) for p in BENCH_PLANTS] * 10}, None),
+        "add_plant": ("POST", "/add_plant", {"json": {"name": BENCH_ADDED_PLANT}}, None),
+        "generate": ("POST", "/generate", {"files": {"image": ("leaf.png", image, "image/png")},
+                                           "data": {"plant": BENCH_PLANTS[0]}}, None),
+        "weekly_suggestions": ("GET", "/weekly_suggestions", {}, _job_failed),
+        "daily_news": ("POST", "/daily_news", {}, _job_failed),
+        "post_demand": ("POST", "/post_demand", {}, _job_failed),
+    }
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(base_url, scenario, duration, concurrency):
+    import requests
+
+    method, path, kwargs, failed = scenario
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, timeout=120, **kwargs)
+                elapsed = time.perf_counter() - started
+                error = response.status_code >= 400 or (failed is not None and failed(response))
+                detail = response.status_code
+            except requests.RequestException as e:
+                elapsed, error, detail = time.perf_counter() - started, True, type(e).__name__
+            with lock:
+                latencies.append(elapsed)
+                if error:
+                    errors.append(detail)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "error_samples": sorted({str(e) for e in errors})[:5],
+        "rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def compare(results, baseline, max_regression):
+    """Lines describing every endpoint that got worse than the baseline by more than max_regression."""
+    regressions = []
+    for name, now in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {now['p95_ms']} ms")
+        if before["rps"] and now["rps"] < before["rps"] * (1 - max_regression):
+            regressions.append(f"{name}: {before['rps']} req/s -> {now['rps']} req/s")
+        if now["errors"] > before["errors"]:
+            regressions.append(f"{name}: {before['errors']} errors -> {now['errors']} errors")
+    return regressions
+
+
+def print_report(results):
+    print(f"\n{'endpoint':<24}{'reqs':>7}{'err':>6}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        print(f"{name:<24}{r['requests']:>7}{r['errors']:>6}{r['rps']:>9}{r['p50_ms']:>10}"
+              f"{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+        if r["error_samples"]:
+            print(f"{'':<24}errors: {', '.join(r['error_samples'])}")
+
+
+def _serve(app):
+    from werkzeug.serving import make_server
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--only", help="comma-separated scenario names")
+    parser.add_argument("--url", help="benchmark an app that is already running instead of serving one")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds per fake Gemini call")
+    parser.add_argument("--pages", type=int, default=10, help="listing pages the fixture server answers")
+    parser.add_argument("--logs-per-plant", type=int, default=500)
+    parser.add_argument("--news", type=int, default=200)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25)
+    args = parser.parse_args()
+
+    _bench_env(args)
+    import fixture_server
+
+    fixtures, fixtures_url = fixture_server.start(max_pages=args.pages)
+    fixture_server.route_scrapers(fixtures_url)
+
+    from app import create_app
+
+    # Builds the app even with --url: it runs the migrations the seed needs
+    app = create_app()
+    seed(args.logs_per_plant, args.news)
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = _serve(app)
+    print(f"Benchmarking {base_url} ({args.concurrency} clients, {args.duration:g}s per scenario); "
+          f"fixtures at {fixtures_url}")
+
+    all_scenarios = scenarios()
+    names = args.only.split(",") if args.only else list(all_scenarios)
+    unknown = [name for name in names if name not in all_scenarios]
+    if unknown:
+        parser.error("unknown scenario(s): " + ", ".join(unknown))
+
+    runs = [(name, name) for name in names]
+    if server is not None:
+        # The in-process app reads LLM_CACHE_ENABLED on every call
+        runs += [(name + ":cached", name) for name in names if name in CACHED_SCENARIOS]
+
+    results = {}
+    for label, name in runs:
+        os.environ["LLM_CACHE_ENABLED"] = "1" if label.endswith(":cached") else "0"
+        results[label] = run_scenario(base_url, all_scenarios[name], args.duration, args.concurrency)
+        print(f"  {label}: {results[label]['requests']} requests, p95 {results[label]['p95_ms']} ms")
+
+    if server is not None:
+        server.shutdown()
+    fixtures.shutdown()
+
+    print_report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"results": results, "args": vars(args)}, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.max_regression)
+        for line in regressions:
+            print("REGRESSION " + line)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
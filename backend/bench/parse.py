@@ -0,0 +1,97 @@
+"""Parsing micro-benchmark and extraction check for the news scrapers.
+
+Parses the saved pages in bench/fixtures three ways — the whole page with
+html.parser (what the scrapers used to do), the whole page with lxml, and
+only the tags news.SELECTORS keeps with lxml — and reports the time per page.
+It fails if the partial parse extracts anything different from a full
+html.parser parse, or if an expected field comes back empty.
+
+    python bench/parse.py                  # from backend/
+    python bench/parse.py --runs 500
+"""
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import fixture_server  # noqa: E402
+
+# (source, page kind, fixture path, what the extraction must find)
+CASES = [
+    ("da", "listing", "/category/news/", {"links": 5}),
+    ("da", "article", "/bench-da-article-1-1/", {"title": "DA bulletin 1-1", "text": "buffer stocking", "image": ".jpg"}),
+    ("rappler", "listing", "/topic/agriculture-philippines/page/7/", {"articles": 3}),
+    ("rappler", "article", "/philippines/bench-rappler-article-7-1/", {"title": "Rappler story 7-1", "text": "cloud seeding"}),
+]
+
+
+def _time(fn, runs):
+    started = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def _check(result, expected):
+    problems = []
+    for name, want in expected.items():
+        got = result.get(name)
+        if isinstance(want, int):
+            if not isinstance(got, list) or len(got) != want:
+                problems.append(f"{name}: expected {want} items, got {got!r}")
+            elif any(not all(item.values()) for item in got if isinstance(item, dict)):
+                problems.append(f"{name}: empty nested field in {got!r}")
+        elif not got or want not in got:
+            problems.append(f"{name}: expected {want!r} in {got!r}")
+    return problems
+
+
+def _normalized(result):
+    # Parsers disagree on whitespace around block elements; compare words
+    if isinstance(result, str):
+        return " ".join(result.split())
+    if isinstance(result, list):
+        return [_normalized(v) for v in result]
+    if isinstance(result, dict):
+        return {k: _normalized(v) for k, v in result.items()}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    from news import SELECTORS
+    from page_parser import Page, extract, parse, parser_name
+
+    fast = parser_name()
+    failures = []
+    print(f"{'page':<18}{'bytes':>8}{'html.parser':>14}{fast + ' full':>14}{fast + ' partial':>16}{'speedup':>10}")
+    for source, kind, path, expected in CASES:
+        content = fixture_server.render(path, max_pages=10).encode("utf-8")
+        page = SELECTORS[source][kind]
+        whole = Page(keep=None, fields=page.fields)
+
+        reference = extract(parse(content, whole, source, parser="html.parser"), whole)
+        partial = extract(parse(content, page, source), page)
+        if _normalized(partial) != _normalized(reference):
+            failures.append(f"{source} {kind}: partial parse extracted {partial!r}, full parse {reference!r}")
+        failures.extend(f"{source} {kind}: {problem}" for problem in _check(partial, expected))
+
+        slow_ms = _time(lambda: parse(content, whole, source, parser="html.parser"), args.runs)
+        full_ms = _time(lambda: parse(content, whole, source), args.runs)
+        partial_ms = _time(lambda: parse(content, page, source), args.runs)
+        print(f"{source + ' ' + kind:<18}{len(content):>8}{slow_ms:>12.3f}ms{full_ms:>12.3f}ms"
+              f"{partial_ms:>14.3f}ms{slow_ms / partial_ms:>9.1f}x")
+
+    for failure in failures:
+        print("\nFAIL: " + failure)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
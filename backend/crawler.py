@@ -0,0 +1,129 @@
+"""Walks a source's listing pages, newest first, and fetches the new articles they link to.
+
+Article pages are fetched concurrently while later listing pages are still
+being read. Every request goes through a per-host limiter: at most
+CRAWL_HOST_CONCURRENCY in flight and CRAWL_HOST_DELAY seconds between request
+starts. The walk stops after CRAWL_MAX_PAGES listing pages, at the first
+missing or empty page, or once CRAWL_STOP_AFTER_SEEN links in a row are
+already in `news` (everything older has been ingested before).
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import http_client
+from seen_urls import SeenUrlIndex, normalize_url
+
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "3"))
+CRAWL_HOST_CONCURRENCY = int(os.getenv("CRAWL_HOST_CONCURRENCY", "2"))
+CRAWL_HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", "0.5"))
+CRAWL_STOP_AFTER_SEEN = int(os.getenv("CRAWL_STOP_AFTER_SEEN", "3"))
+
+
+class HostLimiter:
+    """Politeness for one host: a cap on requests in flight and a minimum gap between their starts."""
+
+    def __init__(self, concurrency, delay):
+        self.delay = delay
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._next_start = 0.0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        with self._slots:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start)
+                self._next_start = start + self.delay
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(host):
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = HostLimiter(CRAWL_HOST_CONCURRENCY, CRAWL_HOST_DELAY)
+        return limiter
+
+
+def polite_get(url, use_cache=False):
+    with get_limiter(urlsplit(url).netloc).slot():
+        return http_client.get(url, use_cache=use_cache)
+
+
+def _fetch_article(source, link, image_url, parse_article):
+    try:
+        response = polite_get(link)
+        if response.status_code != 200:
+            print(f"Skipping {source} article {link}: HTTP {response.status_code}")
+            return None
+        return parse_article(link, image_url, response.content)
+    except Exception as e:
+        print(f"Error fetching {source} article {link}: {e}")
+        return None
+
+
+def crawl(source, page_url, parse_listing, parse_article, seen=None, max_pages=None):
+    """Articles from up to `max_pages` listing pages of one source, newest first.
+
+    page_url(n) gives the URL of listing page n (1-based).
+    parse_listing(content, url) returns [(article_url, image_url or None), ...].
+    parse_article(url, image_url, content) returns a (text, url, title, image_url)
+    tuple, or None if the page has no article.
+    Links already in `seen` are skipped, and claimed there so other sources skip them too.
+    """
+    max_pages = max_pages or CRAWL_MAX_PAGES
+    seen = SeenUrlIndex() if seen is None else seen
+    queued = set()
+    futures = []
+    pages = known_in_a_row = 0
+    stopped = "max_pages"
+
+    executor = ThreadPoolExecutor(max_workers=max(1, CRAWL_HOST_CONCURRENCY), thread_name_prefix=f"crawl-{source}")
+    try:
+        for page in range(1, max_pages + 1):
+            url = page_url(page)
+            # Listing pages are re-read every run, so they are worth a conditional GET
+            response = polite_get(url, use_cache=True)
+            if response.status_code != 200:
+                if page == 1:
+                    raise RuntimeError(f"{source} listing {url} returned HTTP {response.status_code}")
+                stopped = "end"
+                break
+            pages += 1
+            links = parse_listing(response.content, url)
+            if not links:
+                stopped = "end"
+                break
+            for link, image_url in links:
+                key = normalize_url(link)
+                if key in queued:
+                    continue
+                queued.add(key)
+                if not seen.claim(link):
+                    known_in_a_row += 1
+                    if known_in_a_row >= CRAWL_STOP_AFTER_SEEN:
+                        break
+                    continue
+                known_in_a_row = 0
+                futures.append(executor.submit(_fetch_article, source, link, image_url, parse_article))
+            if known_in_a_row >= CRAWL_STOP_AFTER_SEEN:
+                stopped = "seen"
+                break
+        articles = [article for article in (f.result() for f in futures) if article]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    print(f"Crawled {source}: {pages} listing page(s), {len(futures)} new link(s), "
+          f"{len(articles)} article(s), stopped at {stopped}")
+    return articles
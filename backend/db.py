@@ -0,0 +1,271 @@
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+
+from metrics import DB_CHECKOUT_SECONDS, DB_QUERY_SECONDS
+
+
+@lru_cache(maxsize=None)
+def _timed_cursor():
+    """Cursor class that records how long each statement takes.
+
+    Built on first connect so importing this module does not load psycopg2.
+    """
+    from psycopg2 import extensions
+
+    class TimedCursor(extensions.cursor):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                DB_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+        def executemany(self, query, vars_list):
+            started = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                DB_QUERY_SECONDS.observe(time.perf_counter() - started)
+
+    return TimedCursor
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections shared by every route."""
+
+    def __init__(self, minconn, maxconn, timeout, healthcheck_after, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Invalid pool size: min=%s max=%s" % (minconn, maxconn))
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+        self.connect_kwargs = connect_kwargs
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (conn, returned_at)
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._healthcheck_failures = 0
+        self._connect_errors = 0
+
+        for _ in range(minconn):
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"Error pre-opening pooled connection: {e}")
+                break
+            self._idle.append((conn, time.monotonic()))
+            self._size += 1
+
+    def _connect(self):
+        try:
+            import psycopg2
+
+            return psycopg2.connect(cursor_factory=_timed_cursor(), **self.connect_kwargs)
+        except Exception:
+            with self._lock:
+                self._connect_errors += 1
+            raise
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self, timeout=None):
+        """Check out a connection, waiting up to `timeout` seconds for one to free up."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            with self._lock:
+                if self._closed:
+                    from psycopg2.pool import PoolError
+
+                    raise PoolError("connection pool is closed")
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            "Timed out after %.1fs waiting for a database connection" % timeout
+                        )
+                    self._lock.wait(remaining)
+                if self._idle:
+                    conn, returned_at = self._idle.popleft()
+                    new = False
+                else:
+                    # Reserve the slot before connecting outside the lock
+                    self._size += 1
+                    conn, returned_at, new = None, None, True
+
+            if new:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif not self._is_healthy(conn, returned_at):
+                with self._lock:
+                    self._healthcheck_failures += 1
+                self._discard(conn)
+                continue
+
+            waited = time.monotonic() - started
+            DB_CHECKOUT_SECONDS.observe(waited)
+            with self._lock:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool, rolling back any open transaction."""
+        if not discard and not conn.closed:
+            from psycopg2 import extensions
+
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if discard or conn.closed or self._closed:
+            self._discard(conn)
+            return
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+            self._lock.notify()
+
+    def _discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            self._size -= 1
+            self._lock.notify()
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._lock.notify_all()
+        for conn, _ in idle:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "wait_seconds_total": round(self._wait_total, 6),
+                "wait_seconds_max": round(self._wait_max, 6),
+                "wait_seconds_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+                "healthcheck_failures": self._healthcheck_failures,
+                "connect_errors": self._connect_errors,
+            }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Read here rather than at import so values from .env (loaded by the entry point) apply
+                _pool = ConnectionPool(
+                    int(os.getenv("DB_POOL_MIN", "1")),
+                    int(os.getenv("DB_POOL_MAX", "10")),
+                    float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                    # Idle connections older than this are pinged before being handed out again
+                    float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30")),
+                    dbname=os.getenv("DB_NAME"),
+                    user=os.getenv("DB_USER"),
+                    password=os.getenv("DB_PASSWORD"),
+                    host=os.getenv("DB_HOST"),  # Cloud SQL Proxy uses localhost
+                    port=os.getenv("DB_PORT"),
+                )
+    return _pool
+
+
+@contextmanager
+def db_connection():
+    """Borrow a pooled connection for the duration of a `with` block.
+
+    Yields None if no connection could be obtained, so routes can keep
+    returning their usual "Failed to connect to the database" error.
+    """
+    try:
+        pool = get_pool()
+        conn = pool.getconn()
+    except Exception as e:
+        print(f"Error connecting to the database: {e}")
+        yield None
+        return
+
+    import psycopg2
+
+    broken = False
+    try:
+        yield conn
+    except psycopg2.InterfaceError:
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, discard=broken or conn.closed)
+
+
+def pool_stats():
+    return get_pool().stats() if _pool is not None else {"size": 0, "checkouts": 0}
+
+
+def close_pool():
+    """Close every pooled connection and forget the pool; the next checkout builds a new one.
+
+    gunicorn calls this in the master before forking so workers never share sockets.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.closeall()
@@ -0,0 +1,69 @@
+import json
+import math
+
+DIRECTIONS = ("increasing", "decreasing")
+
+# crop_price.price is NUMERIC(12,2)
+MAX_PRICE = 10 ** 10
+
+
+def _price(value):
+    """Price as a float rounded to centavos; tolerates "₱1,234.50"-style strings from the model."""
+    if isinstance(value, bool):
+        raise ValueError("price must be a number")
+    if isinstance(value, (int, float)):
+        price = float(value)
+    elif isinstance(value, str):
+        cleaned = value.replace(",", "").replace("₱", "").replace("PHP", "").replace("Php", "").strip()
+        price = float(cleaned)
+    else:
+        raise ValueError("price must be a number")
+    # float() accepts "nan" and "inf", which JSONB and NUMERIC both reject
+    if not math.isfinite(price):
+        raise ValueError("price must be a finite number")
+    price = round(price, 2)
+    if not 0 <= price < MAX_PRICE:
+        raise ValueError(f"price must be between 0 and {MAX_PRICE:,}")
+    return price
+
+
+def parse_demand(text):
+    """Turn Gemini's demand answer into {"increasing": [...], "decreasing": [...]}.
+
+    Every entry is {"crop": str, "price": float, "analysis": str}. Entries that
+    cannot be read are dropped; raises ValueError if nothing usable is left.
+    """
+    cleaned = text.replace("```json", "").replace("```", "").strip()
+    try:
+        data = json.loads(cleaned)
+    except ValueError as e:
+        raise ValueError(f"Demand answer is not valid JSON: {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Demand answer must be a JSON object")
+
+    document = {}
+    for direction in DIRECTIONS:
+        entries = data.get(direction) or []
+        if not isinstance(entries, list):
+            raise ValueError(f"'{direction}' must be a list")
+        document[direction] = []
+        for entry in entries:
+            try:
+                crop = str(entry["crop"]).strip()
+                if not crop:
+                    raise ValueError("empty crop name")
+                document[direction].append({
+                    "crop": crop,
+                    "price": _price(entry.get("price")),
+                    "analysis": str(entry.get("analysis") or "").strip(),
+                })
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                print(f"Skipping unusable {direction} demand entry {entry!r}: {e}")
+    if not any(document.values()):
+        raise ValueError("Demand answer has no usable crops")
+    return document
+
+
+def legacy_payload(document):
+    """The double-encoded string older app builds read from /get_demand's `json` field."""
+    return json.dumps({"response": json.dumps(document)})
@@ -0,0 +1,124 @@
+"""A local stand-in for genai.GenerativeModel, for load tests and offline runs.
+
+Enable with GEMINI_FAKE=1; models.get_client() then hands out FakeModel
+instead of calling Gemini. Tune it with:
+
+    FAKE_GEMINI_LATENCY        mean seconds per call (default 0.2)
+    FAKE_GEMINI_JITTER         +/- seconds added uniformly (default 0.05)
+    FAKE_GEMINI_FAILURE_RATE   share of calls failing with 503 (default 0)
+    FAKE_GEMINI_429_RATE       share of calls failing with 429 (default 0)
+    FAKE_GEMINI_TEXT           the answer text for every prompt (default: shaped by the prompt)
+
+Without FAKE_GEMINI_TEXT, a batched news-insight prompt ("### Article N"
+sections) gets a JSON array with one summary per article, and anything else
+gets DEFAULT_TEXT, which reads both as a diagnosis and as a demand document.
+"""
+import json
+import os
+import random
+import re
+import time
+
+DEFAULT_TEXT = json.dumps({
+    "risk_level": "low",
+    "disease": "none detected",
+    "farmer_actions": ["Keep watering regularly", "Check the leaves again next week"],
+    "increasing": [{"crop": "Rice", "price": 48.5, "analysis": "Dry spell cuts the main crop"}],
+    "decreasing": [{"crop": "Onion", "price": 85.0, "analysis": "Imports arrived"}],
+})
+
+# Section headings of news._generate_insights_for_batch() prompts
+ARTICLE_HEADING = re.compile(r"^### Article (\d+)$", re.MULTILINE)
+
+
+class _Feedback:
+    block_reason = None
+    safety_ratings = []
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, candidates_tokens):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = candidates_tokens
+        self.total_token_count = prompt_tokens + candidates_tokens
+
+
+class FakeResponse:
+    """Mimics the parts of GenerateContentResponse the app reads."""
+
+    prompt_feedback = _Feedback()
+
+    def __init__(self, text, prompt_tokens):
+        self.text = text
+        self.usage_metadata = _Usage(prompt_tokens, max(1, len(text) // 4))
+        self._chunks = None
+
+    def __iter__(self):
+        for chunk in self._chunks or [self]:
+            yield chunk
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    def __init__(self, model_name, generation_config=None):
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        self.latency = float(os.getenv("FAKE_GEMINI_LATENCY", "0.2"))
+        self.jitter = float(os.getenv("FAKE_GEMINI_JITTER", "0.05"))
+        self.failure_rate = float(os.getenv("FAKE_GEMINI_FAILURE_RATE", "0"))
+        self.rate_limit_rate = float(os.getenv("FAKE_GEMINI_429_RATE", "0"))
+        self.text = os.getenv("FAKE_GEMINI_TEXT")
+
+    def _maybe_fail(self):
+        from google.api_core import exceptions as api_exceptions
+
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            raise api_exceptions.ResourceExhausted("fake quota exceeded")
+        if roll < self.rate_limit_rate + self.failure_rate:
+            raise api_exceptions.ServiceUnavailable("fake upstream unavailable")
+
+    def _answer(self, parts):
+        if self.text is not None:
+            return self.text
+        prompt = "\n".join(part for part in parts if isinstance(part, str))
+        article_ids = ARTICLE_HEADING.findall(prompt)
+        if article_ids:
+            return json.dumps([
+                {"id": int(article_id), "summary": f"Fake insight for article {article_id}: keep an eye on prices."}
+                for article_id in article_ids
+            ])
+        return DEFAULT_TEXT
+
+    def generate_content(self, contents, stream=False, request_options=None):
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        text = self._answer(parts)
+        prompt_tokens = sum(len(part) // 4 if isinstance(part, str) else 258 for part in parts)
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        timeout = (request_options or {}).get("timeout")
+        if timeout is not None and delay > timeout:
+            from google.api_core import exceptions as api_exceptions
+
+            time.sleep(timeout)
+            raise api_exceptions.DeadlineExceeded("fake deadline exceeded")
+        self._maybe_fail()
+        if not stream:
+            time.sleep(delay)
+            return FakeResponse(text, prompt_tokens)
+
+        # Stream the answer in a handful of chunks spread over the latency
+        size = max(1, len(text) // 5)
+        pieces = [text[i:i + size] for i in range(0, len(text), size)]
+        response = FakeResponse(text, prompt_tokens)
+
+        def chunks():
+            for piece in pieces:
+                time.sleep(delay / len(pieces))
+                yield _Chunk(piece)
+
+        response._chunks = chunks()
+        return response
@@ -0,0 +1,297 @@
+"""Client-side throttling for Gemini calls.
+
+Every model gets its own Governor with:
+  - a token bucket (LLM_RATE_PER_MINUTE, LLM_BURST) so bursts from /generate and
+    the daily job are spread out instead of tripping the upstream quota,
+  - a semaphore capping in-flight calls (LLM_MAX_CONCURRENCY),
+  - retries with full-jitter exponential backoff on retryable errors,
+  - a circuit breaker that fails fast for LLM_BREAKER_COOLDOWN seconds after
+    LLM_BREAKER_THRESHOLD consecutive upstream failures.
+
+Per-model overrides go in LLM_LIMITS, e.g.
+LLM_LIMITS='{"gemini-2.5-pro-preview-05-06": {"rate_per_minute": 5, "max_concurrency": 2}}'
+
+State is per process; each gunicorn worker throttles independently.
+"""
+import json
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+
+from metrics import LLM_REJECTED, LLM_RETRIES
+
+# name -> (environment variable, type, default). Read through setting() when
+# used rather than at import, so values from .env (loaded by app.configure()) apply
+SETTINGS = {
+    "rate_per_minute": ("LLM_RATE_PER_MINUTE", float, "60"),
+    "burst": ("LLM_BURST", int, "10"),
+    "max_concurrency": ("LLM_MAX_CONCURRENCY", int, "4"),
+    "acquire_timeout": ("LLM_ACQUIRE_TIMEOUT", float, "30"),
+    "max_retries": ("LLM_MAX_RETRIES", int, "3"),
+    "retry_base": ("LLM_RETRY_BASE", float, "1"),
+    "retry_max": ("LLM_RETRY_MAX", float, "20"),
+    "breaker_threshold": ("LLM_BREAKER_THRESHOLD", int, "5"),
+    "breaker_cooldown": ("LLM_BREAKER_COOLDOWN", float, "30"),
+}
+
+
+def setting(name, model_name=None):
+    """A governor setting: the LLM_LIMITS override for `model_name` if any, else the environment."""
+    env, cast, default = SETTINGS[name]
+    limits = json.loads(os.getenv("LLM_LIMITS", "{}")).get(model_name, {}) if model_name else {}
+    return cast(limits.get(name, os.getenv(env, default)))
+
+
+@lru_cache(maxsize=None)
+def retryable_errors():
+    """Errors worth another attempt on the same model after a pause."""
+    from google.api_core import exceptions as api_exceptions
+
+    return (
+        api_exceptions.ResourceExhausted,
+        api_exceptions.TooManyRequests,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+    )
+
+
+@lru_cache(maxsize=None)
+def upstream_errors():
+    """Errors that count against the breaker; timeouts are not retried (the caller already waited the full deadline)."""
+    from google.api_core import exceptions as api_exceptions
+
+    return retryable_errors() + (api_exceptions.DeadlineExceeded, TimeoutError)
+
+
+class LLMUnavailable(Exception):
+    """The governor refused the call; retry after `retry_after` seconds."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimited(LLMUnavailable):
+    pass
+
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, burst):
+        self.rate = rate_per_second
+        self.capacity = max(1, burst)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, timeout):
+        """Take one token, waiting up to `timeout` seconds. Returns False if none came free."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate if self.rate > 0 else timeout
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """closed -> open after `threshold` consecutive failures -> half-open after `cooldown`."""
+
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go through now."""
+        with self._lock:
+            if self.state == "open":
+                remaining = self._opened_at + self.cooldown - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpen("Model temporarily unavailable", retry_after=remaining)
+                self.state = "half_open"
+                self._trial_running = False
+            if self.state == "half_open":
+                # Let exactly one trial call probe the upstream
+                if self._trial_running:
+                    raise CircuitOpen("Model temporarily unavailable", retry_after=self.cooldown)
+                self._trial_running = True
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_running = False
+            if self.state == "half_open" or self._failures >= self.threshold:
+                self.state = "open"
+                self._opened_at = time.monotonic()
+
+    def release_trial(self):
+        """A trial call ended without saying anything about upstream health."""
+        with self._lock:
+            self._trial_running = False
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Full-jitter exponential backoff for the given 0-based retry attempt."""
+    base = setting("retry_base") if base is None else base
+    cap = setting("retry_max") if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class Governor:
+    def __init__(self, model_name, rate_per_minute, burst, max_concurrency, max_retries,
+                 breaker_threshold, breaker_cooldown, acquire_timeout):
+        self.model_name = model_name
+        self.bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_cooldown)
+        self.max_retries = max_retries
+        self.acquire_timeout = acquire_timeout
+        self.max_concurrency = max_concurrency
+
+    def _admit(self):
+        try:
+            self.breaker.before_call()
+        except CircuitOpen:
+            LLM_REJECTED.inc(model=self.model_name, reason="circuit_open")
+            raise
+        started = time.monotonic()
+        if not self.bucket.acquire(self.acquire_timeout):
+            self.breaker.release_trial()
+            LLM_REJECTED.inc(model=self.model_name, reason="rate_limited")
+            raise RateLimited("Too many model requests, please retry shortly", retry_after=self.acquire_timeout)
+        remaining = max(0.0, self.acquire_timeout - (time.monotonic() - started))
+        if not self.semaphore.acquire(timeout=remaining):
+            self.breaker.release_trial()
+            LLM_REJECTED.inc(model=self.model_name, reason="concurrency")
+            raise RateLimited("Too many model requests in flight, please retry shortly", retry_after=5)
+
+    def _record(self, error):
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, upstream_errors()):
+            self.breaker.record_failure()
+        else:
+            # Bad prompt, auth error, ...: the upstream is answering fine
+            self.breaker.record_success()
+
+    def call(self, fn):
+        """Run fn() under the rate limit, concurrency cap and breaker, retrying retryable errors."""
+        attempt = 0
+        while True:
+            self._admit()
+            try:
+                result = fn()
+            except Exception as e:
+                self._record(e)
+                if not isinstance(e, retryable_errors()) or attempt >= self.max_retries:
+                    raise
+            else:
+                self._record(None)
+                return result
+            finally:
+                self.semaphore.release()
+            LLM_RETRIES.inc(model=self.model_name)
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def stream(self, open_stream):
+        """Iterate the chunks of open_stream() while holding one concurrency slot.
+
+        Retries happen only until the first chunk arrives; after that an error
+        is passed on, since the caller has already seen partial output.
+        """
+        attempt = 0
+        while True:
+            self._admit()
+            started = False
+            try:
+                for chunk in open_stream():
+                    started = True
+                    yield chunk
+            except Exception as e:
+                self._record(e)
+                if started or not isinstance(e, retryable_errors()) or attempt >= self.max_retries:
+                    raise
+            except BaseException:
+                # GeneratorExit: the client went away mid-stream
+                self.breaker.release_trial()
+                raise
+            else:
+                self._record(None)
+                return
+            finally:
+                self.semaphore.release()
+            LLM_RETRIES.inc(model=self.model_name)
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+    def stats(self):
+        return {
+            "state": self.breaker.state,
+            "tokens": round(self.bucket._tokens, 2),
+            "max_concurrency": self.max_concurrency,
+        }
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def get_governor(model_name):
+    governor = _governors.get(model_name)
+    if governor is None:
+        with _governors_lock:
+            governor = _governors.get(model_name)
+            if governor is None:
+                governor = _governors[model_name] = Governor(
+                    model_name,
+                    rate_per_minute=setting("rate_per_minute", model_name),
+                    burst=setting("burst", model_name),
+                    max_concurrency=setting("max_concurrency", model_name),
+                    max_retries=setting("max_retries", model_name),
+                    breaker_threshold=setting("breaker_threshold", model_name),
+                    breaker_cooldown=setting("breaker_cooldown", model_name),
+                    acquire_timeout=setting("acquire_timeout", model_name),
+                )
+    return governor
+
+
+def stats():
+    with _governors_lock:
+        governors = dict(_governors)
+    return {name: governor.stats() for name, governor in governors.items()}
+
+
+def retry_after(error):
+    """Seconds a client should wait before retrying if `error` means overload/outage, else None."""
+    if isinstance(error, LLMUnavailable):
+        return max(1, int(error.retry_after or 1))
+    if isinstance(error, retryable_errors()):
+        return int(setting("retry_max"))
+    return None
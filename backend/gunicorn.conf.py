@@ -0,0 +1,71 @@
+"""gunicorn settings for the API: gunicorn -c gunicorn.conf.py
+
+Requests spend nearly all their time waiting on Gemini or Postgres, so the
+default is one worker running many threads (gthread) rather than more processes.
+
+Job records and dedupe keys (jobs.py) and response-cache invalidations
+(response_cache.py) live in process memory unless REDIS_URL and
+RESPONSE_CACHE_REDIS_URL point at Redis, so more than one worker is refused
+without both. The LLM governor's rate limits and breaker (governor.py) and the
+/metrics counters stay per worker even with Redis: with N workers the
+effective LLM rate is N times LLM_RATE_PER_MINUTE and each worker reports its
+own metrics.
+"""
+import os
+
+from dotenv import load_dotenv
+
+import db
+
+# The worker-count check below reads REDIS_URL, which may be set in .env
+load_dotenv()
+
+wsgi_app = "app:create_app()"
+bind = "0.0.0.0:" + os.getenv("PORT", "5000")
+
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+if workers > 1 and not (os.getenv("REDIS_URL") and os.getenv("RESPONSE_CACHE_REDIS_URL")):
+    raise RuntimeError(
+        f"WEB_CONCURRENCY={workers} needs REDIS_URL and RESPONSE_CACHE_REDIS_URL so job state and "
+        "cache invalidations are shared between workers; use one worker with more GUNICORN_THREADS instead"
+    )
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+
+# Import the app (and run migrations) once in the master, then fork
+preload_app = True
+
+# Longer than the slowest model route (demand: 120s) plus its fallback attempt
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "300"))
+# Let in-flight generations finish on deploys and scale-downs
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "120"))
+keepalive = 5
+
+# Recycle workers now and then so slow leaks cannot accumulate. Off by default
+# when job records live in worker memory: recycling would drop them and cut
+# short the jobs running on the worker's thread pool (see worker_exit).
+_shared_jobs = bool(os.getenv("REDIS_URL")) or os.getenv("JOB_BACKEND") == "celery"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000" if _shared_jobs else "0"))
+max_requests_jitter = 100
+
+accesslog = "-"
+errorlog = "-"
+
+
+def pre_fork(server, worker):
+    # Connections opened by migrations in the master must not leak into workers
+    db.close_pool()
+
+
+def post_worker_init(worker):
+    """Runs in each worker before it accepts connections."""
+    from app import warm_up
+
+    warm_up()
+
+
+def worker_exit(server, worker):
+    """Let background jobs of the exiting worker finish (bounded by graceful_timeout)."""
+    import jobs
+
+    jobs.drain()
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metrics import SCRAPE_FETCH_SECONDS
+
+DEFAULT_HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "20"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "apac-http-cache"))
+# The conditional-GET cache is trimmed after every write: copies older than
+# HTTP_CACHE_MAX_AGE seconds go first, then the oldest until it fits HTTP_CACHE_MAX_BYTES
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(20 * 1024 * 1024)))
+HTTP_CACHE_MAX_AGE = float(os.getenv("HTTP_CACHE_MAX_AGE", str(7 * 24 * 3600)))
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+# host -> base URL, e.g. {"www.da.gov.ph": "http://127.0.0.1:8001"} to point
+# the scrapers at a local fixture server.
+_host_overrides = json.loads(os.getenv("SCRAPER_HOST_OVERRIDES", "{}"))
+
+
+def set_host_override(host, base_url):
+    """Send every request for `host` to `base_url` instead (scheme://host[:port])."""
+    _host_overrides[host] = base_url.rstrip("/")
+
+
+def clear_host_overrides():
+    _host_overrides.clear()
+
+
+def _rewrite(url):
+    parts = urlsplit(url)
+    base = _host_overrides.get(parts.netloc)
+    if not base:
+        return url
+    target = urlsplit(base)
+    return urlunsplit((target.scheme, target.netloc, parts.path, parts.query, parts.fragment))
+
+
+def _new_session():
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session(url):
+    """Return the keep-alive session for the URL's host, creating it on first use."""
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _sessions[host] = _new_session()
+    return session
+
+
+def _cache_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(HTTP_CACHE_DIR, key + ".json"), os.path.join(HTTP_CACHE_DIR, key + ".body")
+
+
+def _load_cached(url):
+    meta_path, body_path = _cache_paths(url)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+        return meta, body
+    except (OSError, ValueError):
+        return None, None
+
+
+def _store_cached(url, response):
+    etag = response.headers.get("ETag")
+    last_modified = response.headers.get("Last-Modified")
+    if not etag and not last_modified:
+        return
+    meta = {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "content_type": response.headers.get("Content-Type"),
+        "encoding": response.encoding,
+    }
+    meta_path, body_path = _cache_paths(url)
+    try:
+        os.makedirs(HTTP_CACHE_DIR, exist_ok=True)
+        # Write body before metadata so a reader never sees metadata without its body
+        for path, data, mode in ((body_path, response.content, "wb"), (meta_path, json.dumps(meta), "w")):
+            tmp = "%s.%d.%d.tmp" % (path, os.getpid(), threading.get_ident())
+            with open(tmp, mode) as f:
+                f.write(data)
+            os.replace(tmp, path)
+    except OSError as e:
+        print(f"Error writing HTTP cache for {url}: {e}")
+        return
+    _evict_cached()
+
+
+_evict_lock = threading.Lock()
+
+
+def _evict_cached():
+    """Drop expired copies, then the least recently written ones, until the cache fits its byte budget."""
+    if not _evict_lock.acquire(blocking=False):
+        return  # another thread is already trimming
+    try:
+        entries = []
+        for name in os.listdir(HTTP_CACHE_DIR):
+            if not name.endswith(".body"):
+                continue
+            body_path = os.path.join(HTTP_CACHE_DIR, name)
+            try:
+                stat = os.stat(body_path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, body_path))
+        entries.sort()
+
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - HTTP_CACHE_MAX_AGE
+        for mtime, size, body_path in entries:
+            if mtime >= cutoff and total <= HTTP_CACHE_MAX_BYTES:
+                break
+            # Metadata first so a reader never finds metadata without its body
+            for path in (body_path[:-len(".body")] + ".json", body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+    except OSError as e:
+        print(f"Error trimming HTTP cache: {e}")
+    finally:
+        _evict_lock.release()
+
+
+def get(url, use_cache=False, timeout=None, **kwargs):
+    """GET `url` through the shared session for its host.
+
+    With `use_cache`, the request is made conditional on the ETag/Last-Modified
+    of the last copy on disk, and a 304 is answered from that copy. The returned
+    response then has status 200 and `from_cache = True`. Only pass it for
+    pages fetched again on every run (listing pages); articles are fetched once,
+    so caching them would only fill the disk.
+    """
+    target = _rewrite(url)
+    headers = dict(kwargs.pop("headers", None) or {})
+    meta = body = None
+    if use_cache:
+        meta, body = _load_cached(url)
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+    started = time.perf_counter()
+    try:
+        response = get_session(target).get(
+            target,
+            headers=headers,
+            timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+            **kwargs
+        )
+    except requests.exceptions.RequestException:
+        SCRAPE_FETCH_SECONDS.observe(time.perf_counter() - started, host=urlsplit(url).netloc, status="error")
+        raise
+    SCRAPE_FETCH_SECONDS.observe(
+        time.perf_counter() - started, host=urlsplit(url).netloc, status=response.status_code
+    )
+    response.from_cache = False
+
+    if response.status_code == 304 and meta is not None:
+        response.status_code = 200
+        response._content = body
+        response.encoding = meta.get("encoding")
+        if meta.get("content_type"):
+            response.headers["Content-Type"] = meta["content_type"]
+        response.from_cache = True
+        for path in _cache_paths(url):
+            try:
+                os.utime(path)  # still in use: keep it away from eviction
+            except OSError:
+                pass
+    elif use_cache and response.status_code == 200:
+        _store_cached(url, response)
+    return response
@@ -0,0 +1,324 @@
+"""Background jobs for the slow routes (/daily_news, /weekly_suggestions, /post_demand).
+
+Backends (JOB_BACKEND):
+  eager   run inline at enqueue time (tests, local scripts)
+  thread  run on an in-process thread pool after the 202 response (default)
+  celery  hand off to a Celery worker through Redis
+
+The thread backend keeps working after the response has been sent, which
+only works where the CPU stays allocated between requests. On Cloud Run
+(detected through K_SERVICE) that needs --no-cpu-throttling; deploy with it
+and set JOB_CPU_ALWAYS_ALLOCATED=1, otherwise jobs run eagerly there.
+
+Job records and dedupe keys live in Redis whenever REDIS_URL is set, for
+every backend. Without it they are per process, and only finished jobs are
+written to Postgres (job_results), so /jobs/<id> still answers after a
+restart.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Read through setting() when used rather than at import, so values from .env
+# (loaded by app.configure()) apply whatever imported this module first
+DEFAULTS = {
+    "JOB_BACKEND": "thread",
+    "JOB_WORKERS": "2",
+    # A succeeded job keeps answering for its dedupe key this long, so scheduler
+    # retries of a finished run do not start another one
+    "JOB_DEDUPE_SECONDS": "600",
+    # Upper bound on how long a queued/running job holds its dedupe key
+    "JOB_LOCK_SECONDS": "3600",
+    "JOB_RESULT_TTL": "86400",
+    "REDIS_URL": "",
+    "JOB_CPU_ALWAYS_ALLOCATED": "0",
+}
+
+
+def setting(name):
+    return os.getenv(name, DEFAULTS[name])
+
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+
+_registry = {}
+
+
+def job(name):
+    """Register a function as a queueable job.
+
+    The function must return a (payload, status_code) tuple with a
+    JSON-serializable payload; it runs outside any Flask request context.
+    """
+    def decorator(fn):
+        _registry[name] = fn
+        return fn
+    return decorator
+
+
+def _persist(record):
+    """Write a finished job to job_results so it outlives this process."""
+    try:
+        from db import db_connection
+
+        with db_connection() as conn:
+            if conn is None:
+                print(f"Could not persist job {record['id']}: no database connection")
+                return
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO job_results (id, name, status, record)
+                    VALUES (%s, %s, %s, %s)
+                    ON CONFLICT (id) DO UPDATE
+                    SET status = EXCLUDED.status, record = EXCLUDED.record, finished_at = NOW()
+                """, (record["id"], record["name"], record["status"], json.dumps(record, default=str)))
+                cursor.execute(
+                    "DELETE FROM job_results WHERE finished_at < NOW() - %s * INTERVAL '1 second'",
+                    (int(setting("JOB_RESULT_TTL")),),
+                )
+            conn.commit()
+    except Exception as e:
+        print(f"Error persisting job {record['id']}: {e}")
+
+
+def _load_persisted(job_id):
+    try:
+        from db import db_connection
+
+        with db_connection() as conn:
+            if conn is None:
+                return None
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT record FROM job_results WHERE id = %s", (job_id,))
+                row = cursor.fetchone()
+            conn.commit()
+    except Exception as e:
+        print(f"Error loading job {job_id}: {e}")
+        return None
+    if row is None:
+        return None
+    return row[0] if isinstance(row[0], dict) else json.loads(row[0])
+
+
+class InMemoryJobStore:
+    """Job records and dedupe keys held by this process; finished jobs are also persisted to Postgres."""
+
+    def __init__(self):
+        self._jobs = {}
+        self._dedupe = {}  # key -> (job_id, expires_at)
+        self._lock = threading.Lock()
+
+    def claim(self, dedupe_key, job_id):
+        """Bind `dedupe_key` to `job_id` unless another live job holds it; returns the holder's id."""
+        now = time.time()
+        with self._lock:
+            held = self._dedupe.get(dedupe_key)
+            if held and held[1] > now:
+                return held[0]
+            self._dedupe[dedupe_key] = (job_id, now + int(setting("JOB_LOCK_SECONDS")))
+            return job_id
+
+    def release(self, dedupe_key, job_id, keep_for=0):
+        with self._lock:
+            held = self._dedupe.get(dedupe_key)
+            if held and held[0] == job_id:
+                if keep_for:
+                    self._dedupe[dedupe_key] = (job_id, time.time() + keep_for)
+                else:
+                    del self._dedupe[dedupe_key]
+
+    def save(self, record):
+        with self._lock:
+            self._jobs[record["id"]] = dict(record)
+            cutoff = time.time() - int(setting("JOB_RESULT_TTL"))
+            for job_id in [k for k, v in self._jobs.items() if (v.get("finished_at") or time.time()) < cutoff]:
+                del self._jobs[job_id]
+        if record.get("status") in TERMINAL_STATUSES:
+            _persist(record)
+
+    def get(self, job_id):
+        with self._lock:
+            record = self._jobs.get(job_id)
+        if record is None:
+            # Finished before this process started (restart, other instance)
+            return _load_persisted(job_id)
+        return dict(record)
+
+
+class RedisJobStore:
+    """Job records and dedupe keys shared between every web worker and Celery worker."""
+
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def claim(self, dedupe_key, job_id):
+        key = "apac:job-dedupe:" + dedupe_key
+        if self._redis.set(key, job_id, nx=True, ex=int(setting("JOB_LOCK_SECONDS"))):
+            return job_id
+        holder = self._redis.get(key)
+        return holder.decode() if holder else self.claim(dedupe_key, job_id)
+
+    def release(self, dedupe_key, job_id, keep_for=0):
+        key = "apac:job-dedupe:" + dedupe_key
+        holder = self._redis.get(key)
+        if holder and holder.decode() == job_id:
+            if keep_for:
+                self._redis.expire(key, keep_for)
+            else:
+                self._redis.delete(key)
+
+    def save(self, record):
+        self._redis.set(
+            "apac:job:" + record["id"], json.dumps(record, default=str), ex=int(setting("JOB_RESULT_TTL"))
+        )
+
+    def get(self, job_id):
+        raw = self._redis.get("apac:job:" + job_id)
+        return json.loads(raw) if raw else None
+
+
+_store = None
+_executor = None
+_celery_app = None
+_init_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _init_lock:
+            if _store is None:
+                shared = setting("REDIS_URL") or setting("JOB_BACKEND") == "celery"
+                _store = RedisJobStore(_redis_url()) if shared else InMemoryJobStore()
+    return _store
+
+
+def _redis_url():
+    return setting("REDIS_URL") or "redis://localhost:6379/0"
+
+
+_warned_throttled = False
+
+
+def _backend():
+    """JOB_BACKEND, except that thread jobs run eagerly where the CPU is throttled after responses."""
+    global _warned_throttled
+    backend = setting("JOB_BACKEND")
+    if backend == "thread" and os.getenv("K_SERVICE") and setting("JOB_CPU_ALWAYS_ALLOCATED") != "1":
+        if not _warned_throttled:
+            _warned_throttled = True
+            print("Running jobs inline: Cloud Run throttles CPU after the response. Deploy with "
+                  "--no-cpu-throttling and JOB_CPU_ALWAYS_ALLOCATED=1 to run them in the background.")
+        return "eager"
+    return backend
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=int(setting("JOB_WORKERS")), thread_name_prefix="job")
+    return _executor
+
+
+def drain():
+    """Wait for queued and running thread-backend jobs; called when a web worker exits."""
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+
+
+def get_celery_app(setup=None):
+    """Celery app for the worker: `celery -A app.celery_app worker` (only built with JOB_BACKEND=celery).
+
+    `setup` runs once in each worker process before it takes jobs.
+    """
+    global _celery_app
+    if _celery_app is None:
+        with _init_lock:
+            if _celery_app is None:
+                from celery import Celery
+                celery_app = Celery("apac", broker=_redis_url())
+                celery_app.conf.task_acks_late = True
+                celery_app.conf.worker_prefetch_multiplier = 1
+                celery_app.task(name="apac.run_job")(_execute)
+                if setup is not None:
+                    from celery.signals import worker_process_init
+
+                    worker_process_init.connect(lambda **_: setup(), weak=False)
+                _celery_app = celery_app
+    return _celery_app
+
+
+def _execute(job_id, name, kwargs, dedupe_key=None, keep_for=None):
+    """Run a registered job and record its outcome."""
+    store = get_store()
+    record = store.get(job_id) or {"id": job_id, "name": name, "created_at": time.time()}
+    record.update(status="running", started_at=time.time())
+    store.save(record)
+
+    try:
+        payload, status_code = _registry[name](**kwargs)
+        succeeded = status_code < 400
+        record.update(
+            status="succeeded" if succeeded else "failed",
+            result=payload,
+            status_code=status_code,
+        )
+    except Exception as e:
+        print(f"Error running job {name} ({job_id}): {e}")
+        succeeded = False
+        record.update(status="failed", error=str(e), status_code=500)
+    record["finished_at"] = time.time()
+    store.save(record)
+
+    if dedupe_key:
+        # Failed runs release the key right away so a retry can start a fresh one
+        if keep_for is None:
+            keep_for = int(setting("JOB_DEDUPE_SECONDS"))
+        store.release(dedupe_key, job_id, keep_for=keep_for if succeeded else 0)
+    return record
+
+
+def enqueue(name, dedupe_key=None, keep_for=None, **kwargs):
+    """Queue job `name` and return its record.
+
+    If `dedupe_key` is already held by a queued, running or recently
+    succeeded job, that job's record is returned instead of starting another.
+    A succeeded job holds its key for `keep_for` seconds (default
+    JOB_DEDUPE_SECONDS); 0 releases it as soon as the job finishes.
+    """
+    if name not in _registry:
+        raise KeyError(f"Unknown job: {name}")
+    store = get_store()
+    job_id = uuid.uuid4().hex
+    if dedupe_key:
+        holder = store.claim(dedupe_key, job_id)
+        if holder != job_id:
+            existing = store.get(holder)
+            if existing:
+                existing["deduplicated"] = True
+                return existing
+            # The holder's record has expired; take the key over
+            store.release(dedupe_key, holder)
+            store.claim(dedupe_key, job_id)
+
+    record = {"id": job_id, "name": name, "status": "queued", "created_at": time.time()}
+    store.save(record)
+
+    backend = _backend()
+    if backend == "eager":
+        return _execute(job_id, name, kwargs, dedupe_key, keep_for)
+    if backend == "celery":
+        get_celery_app().send_task("apac.run_job", args=(job_id, name, kwargs, dedupe_key, keep_for))
+    else:
+        _get_executor().submit(_execute, job_id, name, kwargs, dedupe_key, keep_for)
+    return record
+
+
+def get_job(job_id):
+    return get_store().get(job_id)
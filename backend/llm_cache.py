@@ -0,0 +1,309 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import models
+
+# Settings, read on first use so values from .env loaded by app.configure() apply:
+# LLM_CACHE_BACKEND  sqlite: one file shared by every worker on the host (default)
+#                    postgres: the llm_cache table, shared by every instance
+# LLM_CACHE_PATH, LLM_CACHE_TTL (24 h) and LLM_CACHE_MAX_ENTRIES (5000)
+# LLM_CACHE_ENABLED  0 sends every call to the model, as if cache=False (default 1)
+# Expired and overflow entries are purged once every this many writes
+LLM_CACHE_EVICT_EVERY = 50
+
+
+def _normalize_text(text):
+    return " ".join(text.split())
+
+
+def cache_key(model_name, contents, generation_config=None):
+    """Digest of the model name, whitespace-normalized prompt text, image bytes and config."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(json.dumps(generation_config or {}, sort_keys=True, default=str).encode("utf-8"))
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    for part in parts:
+        if isinstance(part, str):
+            digest.update(b"\x00text\x00" + _normalize_text(part).encode("utf-8"))
+        elif isinstance(part, (bytes, bytearray)):
+            digest.update(b"\x00bytes\x00" + bytes(part))
+        elif hasattr(part, "tobytes"):
+            # PIL images: hash the decoded pixels plus their geometry. That is a full
+            # pass over the pixel buffer, so the photo-diagnosis routes pass cache=False
+            digest.update(b"\x00image\x00%s %r\x00" % (part.mode.encode(), part.size))
+            digest.update(part.tobytes())
+        else:
+            digest.update(b"\x00repr\x00" + repr(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CachedResponse:
+    """Stands in for a GenerateContentResponse served from the cache."""
+
+    prompt_feedback = None
+    from_cache = True
+
+    def __init__(self, text, total_tokens):
+        self.text = text
+        self.total_tokens = total_tokens
+
+
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    tokens INTEGER NOT NULL DEFAULT 0,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed_at_idx ON llm_cache (accessed_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key, ttl):
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT response, tokens FROM llm_cache WHERE key = ? AND created_at > ?", (key, now - ttl)
+        ).fetchone()
+        if row:
+            conn.execute("UPDATE llm_cache SET hits = hits + 1, accessed_at = ? WHERE key = ?", (now, key))
+        return row
+
+    def set(self, key, model_name, text, tokens):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO llm_cache (key, model, response, tokens, hits, created_at, accessed_at)"
+            " VALUES (?, ?, ?, ?, 0, ?, ?)",
+            (key, model_name, text, tokens, now, now),
+        )
+
+    def evict(self, ttl, max_entries):
+        conn = self._conn()
+        conn.execute("DELETE FROM llm_cache WHERE created_at <= ?", (time.time() - ttl,))
+        conn.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            " SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (max_entries,),
+        )
+
+    def totals(self):
+        row = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * tokens), 0) FROM llm_cache"
+        ).fetchone()
+        return {"entries": row[0], "stored_hits": row[1], "stored_tokens_saved": row[2]}
+
+
+class PostgresStore:
+    """Uses the llm_cache table created by migration 5."""
+
+    def _run(self, fn):
+        from db import db_connection
+
+        with db_connection() as conn:
+            if conn is None:
+                raise RuntimeError("Failed to connect to the database")
+            with conn.cursor() as cursor:
+                result = fn(cursor)
+            conn.commit()
+            return result
+
+    def get(self, key, ttl):
+        def fn(cursor):
+            cursor.execute(
+                "UPDATE llm_cache SET hits = hits + 1, accessed_at = NOW()"
+                " WHERE key = %s AND created_at > NOW() - make_interval(secs => %s)"
+                " RETURNING response, tokens",
+                (key, ttl),
+            )
+            return cursor.fetchone()
+        return self._run(fn)
+
+    def set(self, key, model_name, text, tokens):
+        self._run(lambda cursor: cursor.execute(
+            "INSERT INTO llm_cache (key, model, response, tokens) VALUES (%s, %s, %s, %s)"
+            " ON CONFLICT (key) DO UPDATE SET response = EXCLUDED.response, tokens = EXCLUDED.tokens,"
+            " hits = 0, created_at = NOW(), accessed_at = NOW()",
+            (key, model_name, text, tokens),
+        ))
+
+    def evict(self, ttl, max_entries):
+        def fn(cursor):
+            cursor.execute("DELETE FROM llm_cache WHERE created_at <= NOW() - make_interval(secs => %s)", (ttl,))
+            cursor.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                " SELECT key FROM llm_cache ORDER BY accessed_at DESC OFFSET %s)",
+                (max_entries,),
+            )
+        self._run(fn)
+
+    def totals(self):
+        def fn(cursor):
+            cursor.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(hits * tokens), 0) FROM llm_cache")
+            return cursor.fetchone()
+        row = self._run(fn)
+        return {"entries": row[0], "stored_hits": int(row[1]), "stored_tokens_saved": int(row[2])}
+
+
+class LLMCache:
+    """Settings left as None are read from the environment when used."""
+
+    def __init__(self, backend=None, ttl=None, max_entries=None):
+        self._backend = backend
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._store = None
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"hits": 0, "misses": 0, "bypassed": 0, "errors": 0, "tokens_saved": 0}
+
+    def _get_store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    if self.backend == "postgres":
+                        self._store = PostgresStore()
+                    else:
+                        default_path = os.path.join(tempfile.gettempdir(), "apac-llm-cache.sqlite3")
+                        self._store = SqliteStore(os.getenv("LLM_CACHE_PATH", default_path))
+        return self._store
+
+    @property
+    def backend(self):
+        return self._backend or os.getenv("LLM_CACHE_BACKEND", "sqlite")
+
+    @property
+    def ttl(self):
+        return self._ttl or int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+
+    @property
+    def max_entries(self):
+        return self._max_entries or int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+
+    @property
+    def enabled(self):
+        return os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+    def _count(self, stat, amount=1):
+        with self._lock:
+            self._stats[stat] += amount
+
+    def _lookup(self, key, ttl):
+        try:
+            row = self._get_store().get(key, ttl)
+        except Exception as e:
+            print(f"Error reading LLM cache: {e}")
+            self._count("errors")
+            return None
+        if row:
+            self._count("hits")
+            self._count("tokens_saved", row[1] or 0)
+        else:
+            self._count("misses")
+        return row
+
+    def _save(self, key, model_name, text, response, ttl):
+        usage = getattr(response, "usage_metadata", None)
+        tokens = getattr(usage, "total_token_count", 0) or 0
+        try:
+            store = self._get_store()
+            store.set(key, model_name, text, tokens)
+            with self._lock:
+                self._writes += 1
+                evict = self._writes % LLM_CACHE_EVICT_EVERY == 0
+            if evict:
+                store.evict(ttl, self.max_entries)
+        except Exception as e:
+            print(f"Error writing LLM cache: {e}")
+            self._count("errors")
+
+    def generate_content(self, task, contents, generation_config=None, cache=True, ttl=None):
+        """Run `task` through the model registry, answering from the cache when possible.
+
+        The key uses the task's primary model, so an answer produced by the
+        fallback model is served for later identical calls too. Pass
+        cache=False to always call the model (the fresh answer is not stored
+        either). Only unblocked, non-empty answers are cached.
+        """
+        if not (cache and self.enabled):
+            self._count("bypassed")
+            return models.generate(task, contents, generation_config)
+
+        ttl = ttl or self.ttl
+        model_name = models.get_route(task)["model"]
+        key = cache_key(model_name, contents, models.merged_config(task, generation_config))
+        row = self._lookup(key, ttl)
+        if row:
+            return CachedResponse(row[0], row[1])
+
+        response = models.generate(task, contents, generation_config)
+        if response.prompt_feedback and response.prompt_feedback.block_reason:
+            return response
+        try:
+            text = response.text
+        except Exception:
+            return response
+        if text:
+            self._save(key, model_name, text, response, ttl)
+        return response
+
+    def stream_content(self, task, contents, generation_config=None, cache=True, ttl=None):
+        """Like generate_content(), but yields the answer text chunk by chunk as it streams in.
+
+        A cache hit is yielded as a single chunk; a streamed answer is cached once complete.
+        """
+        cache = cache and self.enabled
+        if cache:
+            ttl = ttl or self.ttl
+            model_name = models.get_route(task)["model"]
+            key = cache_key(model_name, contents, models.merged_config(task, generation_config))
+            row = self._lookup(key, ttl)
+            if row:
+                yield row[0]
+                return
+        else:
+            self._count("bypassed")
+
+        parts, response = [], None
+        for text, response in models.stream(task, contents, generation_config):
+            parts.append(text)
+            yield text
+
+        if cache and parts and not (response.prompt_feedback and response.prompt_feedback.block_reason):
+            self._save(key, model_name, "".join(parts), response, ttl)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["backend"] = self.backend
+        try:
+            stats.update(self._get_store().totals())
+        except Exception as e:
+            print(f"Error reading LLM cache totals: {e}")
+        return stats
+
+
+llm_cache = LLMCache()
+generate_content = llm_cache.generate_content
+stream_content = llm_cache.stream_content
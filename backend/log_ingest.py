@@ -0,0 +1,119 @@
+import json
+import os
+from datetime import datetime, timezone
+
+
+def batch_max():
+    """Most logs accepted in one batch (LOG_BATCH_MAX), read when used so .env values apply."""
+    return int(os.getenv("LOG_BATCH_MAX", "1000"))
+
+
+INSERT_LOGS_SQL = """
+    INSERT INTO plant_log (plant, watered, fertilizer_applied, height_cm, disease, growth_stage, note, log_date)
+    VALUES %s
+    RETURNING id
+"""
+# log_date arrives as a UTC timestamptz; casting it to timestamp stores it on the
+# same clock (the session time zone) as the NOW() default used by /post_logs
+INSERT_LOGS_TEMPLATE = "(%s, %s, %s, %s, %s, %s, %s, COALESCE(%s::timestamptz::timestamp, NOW()))"
+
+
+def parse_batch(body, content_type):
+    """Decode a JSON array or an NDJSON stream (one log object per line) into a list."""
+    text = body.decode("utf-8") if isinstance(body, bytes) else body
+    if "ndjson" in (content_type or "") or "jsonlines" in (content_type or ""):
+        entries = []
+        for line_no, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"Line {line_no} is not valid JSON: {e}")
+        return entries
+    entries = json.loads(text)
+    if not isinstance(entries, list):
+        raise ValueError("Expected a JSON array of logs")
+    return entries
+
+
+def _optional_text(entry, key):
+    value = entry.get(key)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(f"'{key}' must be a string")
+    return value.strip() or None
+
+
+def validate_log(entry):
+    """Turn one log object (same keys as /post_logs) into an insert row, or raise ValueError."""
+    if not isinstance(entry, dict):
+        raise ValueError("Log must be a JSON object")
+    plant = _optional_text(entry, "plant")
+    if not plant:
+        raise ValueError("Plant name is required")
+
+    watered = entry.get("watered")
+    if watered is None:
+        watered = False
+    elif not isinstance(watered, bool):
+        raise ValueError("'watered' must be true or false")
+
+    height_cm = entry.get("height")
+    if height_cm in (None, ""):
+        height_cm = None
+    else:
+        try:
+            height_cm = round(float(height_cm), 2)
+        except (TypeError, ValueError):
+            raise ValueError("'height' must be a number")
+        # plant_log.height_cm is NUMERIC(5,2)
+        if not 0 <= height_cm < 1000:
+            raise ValueError("'height' must be between 0 and 999.99")
+
+    log_date = entry.get("log_date")
+    if log_date is not None:
+        try:
+            parsed = datetime.fromisoformat(str(log_date).replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError("'log_date' must be an ISO 8601 timestamp")
+        if parsed.tzinfo is None:
+            # A bare local time cannot be placed on the timeline; the device knows its offset
+            raise ValueError("'log_date' must include a UTC offset, e.g. 2025-05-01T08:00:00+08:00 or ...Z")
+        log_date = parsed.astimezone(timezone.utc).isoformat()
+
+    return (
+        plant,
+        watered,
+        _optional_text(entry, "fertilizer"),
+        height_cm,
+        _optional_text(entry, "disease"),
+        _optional_text(entry, "stage"),
+        _optional_text(entry, "note"),
+        log_date,
+    )
+
+
+def validate_batch(entries):
+    """Returns (rows, results): valid insert rows plus a per-entry result list."""
+    rows, results = [], []
+    for index, entry in enumerate(entries):
+        try:
+            rows.append(validate_log(entry))
+            results.append({"index": index, "status": "pending"})
+        except ValueError as e:
+            results.append({"index": index, "status": "invalid", "error": str(e)})
+    return rows, results
+
+
+def insert_logs(conn, rows):
+    """Insert all rows with one multi-row INSERT in a single transaction; returns their ids in order."""
+    from psycopg2.extras import execute_values
+
+    with conn.cursor() as cursor:
+        returned = execute_values(
+            cursor, INSERT_LOGS_SQL, rows, template=INSERT_LOGS_TEMPLATE, page_size=len(rows), fetch=True
+        )
+    conn.commit()
+    return [row[0] for row in returned]
@@ -0,0 +1,157 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Covers fast DB checkouts up to multi-minute Gemini generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._series.items()]
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", repr(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+            lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format (this process only)."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "apac_http_request_duration_seconds", "Request latency by route and status.", ["route", "method", "status"]
+)
+DB_CHECKOUT_SECONDS = Histogram("apac_db_checkout_seconds", "Time spent waiting for a pooled connection.")
+DB_QUERY_SECONDS = Histogram("apac_db_query_seconds", "Time spent executing SQL statements.")
+LLM_REQUEST_SECONDS = Histogram(
+    "apac_llm_request_duration_seconds", "Gemini call latency by task and model.", ["task", "model"]
+)
+LLM_TOKENS = Counter("apac_llm_tokens_total", "Gemini tokens from usage_metadata.", ["model", "kind"])
+LLM_ERRORS = Counter("apac_llm_errors_total", "Failed Gemini calls.", ["model", "error"])
+LLM_RETRIES = Counter("apac_llm_retries_total", "Gemini calls retried after a retryable error.", ["model"])
+LLM_REJECTED = Counter(
+    "apac_llm_rejected_total", "Gemini calls refused by the client-side governor.", ["model", "reason"]
+)
+SCRAPE_FETCH_SECONDS = Histogram("apac_scrape_fetch_seconds", "HTTP fetch time for scraped pages.", ["host", "status"])
+SCRAPE_PARSE_SECONDS = Histogram("apac_scrape_parse_seconds", "HTML parse/extract time per source.", ["source"])
+SCRAPE_RENDER_SECONDS = Histogram(
+    "apac_scrape_render_seconds", "Headless browser render time for pages the static HTML lacks.", ["host", "status"]
+)
+SCRAPE_SOURCE_SECONDS = Histogram(
+    "apac_scrape_source_duration_seconds", "Wall time per news source in the daily job.", ["source", "status"]
+)
+IMAGE_DECODE_SECONDS = Histogram("apac_image_decode_seconds", "Time to decode uploaded images.")
+
+
+def record_usage(model_name, response):
+    """Count prompt/candidate tokens reported by a Gemini response, if any."""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attr in (("prompt", "prompt_token_count"), ("candidates", "candidates_token_count")):
+        count = getattr(usage, attr, 0) or 0
+        if count:
+            LLM_TOKENS.inc(count, model=model_name, kind=kind)
+
+
+def init_app(app):
+    """Time every request and serve the registry on GET /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, route=route, method=request.method, status=response.status_code
+            )
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
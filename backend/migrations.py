@@ -0,0 +1,392 @@
+"""Versioned schema migrations.
+
+All DDL lives here so request handlers only run DML. Migrations are applied
+in order, each in its own transaction, and recorded in schema_migrations.
+They run once at app startup (set RUN_MIGRATIONS=0 to skip) or from the CLI:
+
+    python migrations.py              # apply pending migrations
+    python migrations.py status       # list applied and pending versions
+    python migrations.py dedupe-news  # one-off: delete duplicate news rows
+
+Append new migrations to MIGRATIONS; never edit one that has shipped. A
+statement is an SQL string, or a callable taking the cursor for steps that
+need Python. Migrations never delete rows; data cleanups that do are
+separate commands run by hand.
+"""
+import sys
+
+from seen_urls import normalize_url
+
+# Any constant works as long as nothing else takes the same advisory lock
+MIGRATION_LOCK_ID = 4207301
+
+
+def _backfill_url_keys(cursor):
+    cursor.execute("SELECT id, url FROM news WHERE url IS NOT NULL AND url_key IS NULL")
+    rows = cursor.fetchall()
+    cursor.executemany(
+        "UPDATE news SET url_key = %s WHERE id = %s",
+        [(normalize_url(url), row_id) for row_id, url in rows],
+    )
+    return len(rows)
+
+
+def _require_unique_url_keys(cursor):
+    cursor.execute("""
+        SELECT url_key, COUNT(*) FROM news
+        WHERE url_key IS NOT NULL
+        GROUP BY url_key HAVING COUNT(*) > 1
+        ORDER BY COUNT(*) DESC
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        examples = ", ".join(f"{url} ({count} rows)" for url, count in duplicates[:3])
+        raise RuntimeError(
+            f"news has {len(duplicates)} article URL(s) stored more than once, e.g. {examples}. "
+            "Run `python migrations.py dedupe-news` to keep the oldest row per URL, then migrate again."
+        )
+
+
+MIGRATIONS = [
+    (1, "base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS plants (
+            id SERIAL PRIMARY KEY,
+            name TEXT NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS news (
+            id SERIAL PRIMARY KEY,
+            description TEXT,
+            url TEXT,
+            title TEXT,
+            image_url TEXT,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        # daily_news relies on ON CONFLICT over title
+        "CREATE UNIQUE INDEX IF NOT EXISTS news_title_key ON news (title)",
+        """
+        CREATE TABLE IF NOT EXISTS plant_log (
+            id SERIAL PRIMARY KEY,
+            plant TEXT,
+            log_date TIMESTAMP DEFAULT NOW(),
+            watered BOOLEAN DEFAULT FALSE,
+            fertilizer_applied TEXT,
+            disease TEXT,
+            height_cm NUMERIC(5,2),
+            growth_stage TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS weekly_suggestions (
+            id SERIAL PRIMARY KEY,
+            suggestion TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW()
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS demand (
+            id SERIAL PRIMARY KEY,
+            json TEXT
+        )
+        """,
+    ]),
+    (2, "plant_log note column", [
+        "ALTER TABLE plant_log ADD COLUMN IF NOT EXISTS note TEXT",
+    ]),
+    (3, "unique normalized news url", [
+        # seen_urls.normalize_url(url), written by every insert, so the same
+        # article reached through differently spelled links is stored once
+        "ALTER TABLE news ADD COLUMN IF NOT EXISTS url_key TEXT",
+        _backfill_url_keys,
+        # Existing duplicates stop the migration; removing them is `python migrations.py dedupe-news`
+        _require_unique_url_keys,
+        "CREATE UNIQUE INDEX IF NOT EXISTS news_url_key ON news (url_key)",
+    ]),
+    (4, "indexes for ORDER BY ... LIMIT reads", [
+        # Keyset pagination for /get_news walks this index backwards from the cursor
+        "CREATE INDEX IF NOT EXISTS news_created_at_id_idx ON news (created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS plant_log_log_date_idx ON plant_log (log_date DESC)",
+        "CREATE INDEX IF NOT EXISTS weekly_suggestions_created_at_idx ON weekly_suggestions (created_at DESC)",
+        # demand is read by ORDER BY id DESC, which its primary key index already serves
+    ]),
+    (5, "llm response cache", [
+        # Used when LLM_CACHE_BACKEND=postgres
+        """
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response TEXT NOT NULL,
+            tokens INTEGER NOT NULL DEFAULT 0,
+            hits INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            accessed_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS llm_cache_accessed_at_idx ON llm_cache (accessed_at)",
+    ]),
+    (6, "structured demand snapshots", [
+        # The parsed demand document; rows written before this migration only have `json`
+        "ALTER TABLE demand ADD COLUMN IF NOT EXISTS document JSONB",
+        "ALTER TABLE demand ADD COLUMN IF NOT EXISTS created_at TIMESTAMP DEFAULT NOW()",
+        """
+        CREATE TABLE IF NOT EXISTS crop_price (
+            id SERIAL PRIMARY KEY,
+            snapshot_id INTEGER NOT NULL REFERENCES demand (id) ON DELETE CASCADE,
+            crop TEXT NOT NULL,
+            direction TEXT NOT NULL CHECK (direction IN ('increasing', 'decreasing')),
+            price NUMERIC(12,2),
+            analysis TEXT
+        )
+        """,
+        # /get_demand?direction=... reads one snapshot
+        "CREATE INDEX IF NOT EXISTS crop_price_snapshot_idx ON crop_price (snapshot_id, direction)",
+        # /get_demand?crop=... and /crop_prices match crop names case-insensitively
+        "CREATE INDEX IF NOT EXISTS crop_price_crop_idx ON crop_price (lower(crop), snapshot_id DESC)",
+    ]),
+    (7, "per-plant daily log aggregates", [
+        # One row per plant per day, kept current by a trigger so analytics never scan plant_log.
+        # Only inserts are folded in; the API never updates or deletes logs.
+        """
+        CREATE TABLE IF NOT EXISTS plant_log_daily (
+            plant TEXT NOT NULL,
+            day DATE NOT NULL,
+            logs INTEGER NOT NULL DEFAULT 0,
+            watered INTEGER NOT NULL DEFAULT 0,
+            fertilized INTEGER NOT NULL DEFAULT 0,
+            diseased INTEGER NOT NULL DEFAULT 0,
+            min_height_cm NUMERIC(5,2),
+            max_height_cm NUMERIC(5,2),
+            last_height_cm NUMERIC(5,2),
+            last_height_at TIMESTAMP,
+            last_stage TEXT,
+            last_stage_at TIMESTAMP,
+            PRIMARY KEY (plant, day)
+        )
+        """,
+        # Folds a set of new plant_log rows into plant_log_daily. Written as a
+        # statement-level trigger so a /post_logs/batch insert costs one upsert
+        # per (plant, day) instead of one per row.
+        """
+        CREATE OR REPLACE FUNCTION plant_log_daily_apply() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO plant_log_daily AS d (
+                plant, day, logs, watered, fertilized, diseased,
+                min_height_cm, max_height_cm, last_height_cm, last_height_at, last_stage, last_stage_at
+            )
+            SELECT
+                plant,
+                log_date::date,
+                COUNT(*),
+                COUNT(*) FILTER (WHERE watered),
+                COUNT(*) FILTER (WHERE COALESCE(btrim(fertilizer_applied), '') <> ''),
+                COUNT(*) FILTER (WHERE lower(COALESCE(btrim(disease), '')) NOT IN ('', 'none', 'no', 'n/a', 'healthy')),
+                MIN(height_cm),
+                MAX(height_cm),
+                (array_agg(height_cm ORDER BY log_date DESC) FILTER (WHERE height_cm IS NOT NULL))[1],
+                MAX(log_date) FILTER (WHERE height_cm IS NOT NULL),
+                (array_agg(growth_stage ORDER BY log_date DESC) FILTER (WHERE COALESCE(growth_stage, '') <> ''))[1],
+                MAX(log_date) FILTER (WHERE COALESCE(growth_stage, '') <> '')
+            FROM new_rows
+            WHERE plant IS NOT NULL
+            GROUP BY plant, log_date::date
+            ON CONFLICT (plant, day) DO UPDATE SET
+                logs = d.logs + EXCLUDED.logs,
+                watered = d.watered + EXCLUDED.watered,
+                fertilized = d.fertilized + EXCLUDED.fertilized,
+                diseased = d.diseased + EXCLUDED.diseased,
+                min_height_cm = LEAST(d.min_height_cm, EXCLUDED.min_height_cm),
+                max_height_cm = GREATEST(d.max_height_cm, EXCLUDED.max_height_cm),
+                last_height_cm = CASE
+                    WHEN EXCLUDED.last_height_at >= d.last_height_at OR d.last_height_at IS NULL
+                    THEN COALESCE(EXCLUDED.last_height_cm, d.last_height_cm) ELSE d.last_height_cm END,
+                last_height_at = GREATEST(d.last_height_at, EXCLUDED.last_height_at),
+                last_stage = CASE
+                    WHEN EXCLUDED.last_stage_at >= d.last_stage_at OR d.last_stage_at IS NULL
+                    THEN COALESCE(EXCLUDED.last_stage, d.last_stage) ELSE d.last_stage END,
+                last_stage_at = GREATEST(d.last_stage_at, EXCLUDED.last_stage_at);
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        """,
+        # Block concurrent inserts until the trigger and the backfill commit, so no log is missed or counted twice
+        "LOCK TABLE plant_log IN SHARE ROW EXCLUSIVE MODE",
+        "DROP TRIGGER IF EXISTS plant_log_daily_trg ON plant_log",
+        """
+        CREATE TRIGGER plant_log_daily_trg
+            AFTER INSERT ON plant_log
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE PROCEDURE plant_log_daily_apply()
+        """,
+        # Backfill from the logs written so far
+        """
+        INSERT INTO plant_log_daily (
+            plant, day, logs, watered, fertilized, diseased,
+            min_height_cm, max_height_cm, last_height_cm, last_height_at, last_stage, last_stage_at
+        )
+        SELECT
+            plant,
+            log_date::date,
+            COUNT(*),
+            COUNT(*) FILTER (WHERE watered),
+            COUNT(*) FILTER (WHERE COALESCE(btrim(fertilizer_applied), '') <> ''),
+            COUNT(*) FILTER (WHERE lower(COALESCE(btrim(disease), '')) NOT IN ('', 'none', 'no', 'n/a', 'healthy')),
+            MIN(height_cm),
+            MAX(height_cm),
+            (array_agg(height_cm ORDER BY log_date DESC) FILTER (WHERE height_cm IS NOT NULL))[1],
+            MAX(log_date) FILTER (WHERE height_cm IS NOT NULL),
+            (array_agg(growth_stage ORDER BY log_date DESC) FILTER (WHERE COALESCE(growth_stage, '') <> ''))[1],
+            MAX(log_date) FILTER (WHERE COALESCE(growth_stage, '') <> '')
+        FROM plant_log
+        WHERE plant IS NOT NULL
+        GROUP BY plant, log_date::date
+        """,
+        # Overview queries read the newest days across all plants
+        "CREATE INDEX IF NOT EXISTS plant_log_daily_day_idx ON plant_log_daily (day DESC)",
+    ]),
+    (8, "per-plant weekly suggestions", [
+        # Rows written before this migration cover all plants and have plant = NULL
+        "ALTER TABLE weekly_suggestions ADD COLUMN IF NOT EXISTS plant TEXT",
+        "ALTER TABLE weekly_suggestions ADD COLUMN IF NOT EXISTS fingerprint TEXT",
+        "ALTER TABLE weekly_suggestions ADD COLUMN IF NOT EXISTS last_log_id INTEGER",
+        "ALTER TABLE weekly_suggestions ADD COLUMN IF NOT EXISTS summary TEXT",
+        "CREATE INDEX IF NOT EXISTS weekly_suggestions_plant_idx ON weekly_suggestions (plant, id DESC)",
+        # Newest log per plant and "logs since id N" without scanning other plants
+        "CREATE INDEX IF NOT EXISTS plant_log_plant_id_idx ON plant_log (plant, id DESC)",
+    ]),
+    (9, "finished job records", [
+        # Lets /jobs/<id> answer after a restart when jobs are not kept in Redis
+        """
+        CREATE TABLE IF NOT EXISTS job_results (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            status TEXT NOT NULL,
+            record JSONB NOT NULL,
+            finished_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS job_results_finished_at_idx ON job_results (finished_at)",
+    ]),
+    (10, "news.created_at not null", [
+        # Keyset pagination cursors carry created_at. Rows from before the column had
+        # a default have none; place them with the oldest article, where DESC order puts them last
+        "UPDATE news SET created_at = COALESCE((SELECT MIN(created_at) FROM news), NOW()) WHERE created_at IS NULL",
+        "ALTER TABLE news ALTER COLUMN created_at SET NOT NULL",
+    ]),
+]
+
+
+def dedupe_news(conn):
+    """Delete every news row whose normalized URL an older row already has. Returns the count.
+
+    Works before migration 3 has been applied, which is when it is needed.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id, url FROM news WHERE url IS NOT NULL ORDER BY id")
+        seen, duplicates = set(), []
+        for row_id, url in cursor.fetchall():
+            key = normalize_url(url)
+            if key in seen:
+                duplicates.append(row_id)
+            else:
+                seen.add(key)
+        if duplicates:
+            cursor.execute("DELETE FROM news WHERE id = ANY(%s)", (duplicates,))
+    conn.commit()
+    return len(duplicates)
+
+
+def _ensure_version_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+    conn.commit()
+
+
+def applied_versions(conn):
+    _ensure_version_table(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT version FROM schema_migrations")
+        versions = {row[0] for row in cursor.fetchall()}
+    conn.commit()
+    return versions
+
+
+def run_migrations(conn):
+    """Apply every pending migration. Returns the versions applied by this call."""
+    with conn.cursor() as cursor:
+        # Serialize concurrent runners (several workers booting at once)
+        cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    conn.commit()
+    try:
+        done = applied_versions(conn)
+        applied = []
+        for version, name, statements in MIGRATIONS:
+            if version in done:
+                continue
+            try:
+                with conn.cursor() as cursor:
+                    for statement in statements:
+                        if callable(statement):
+                            statement(cursor)
+                        else:
+                            cursor.execute(statement)
+                    cursor.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, name),
+                    )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"Applied migration {version}: {name}")
+            applied.append(version)
+        return applied
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+
+
+def migrate():
+    """Run pending migrations on a pooled connection; used at startup."""
+    from db import db_connection
+
+    with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("Failed to connect to the database")
+        return run_migrations(conn)
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    from db import db_connection
+
+    load_dotenv()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "status":
+        with db_connection() as conn:
+            if conn is None:
+                sys.exit("Failed to connect to the database")
+            done = applied_versions(conn)
+        for version, name, _ in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in done else 'pending':<8} {name}")
+    elif command == "migrate":
+        applied = migrate()
+        print(f"Applied {len(applied)} migration(s)" if applied else "Schema is up to date")
+    elif command == "dedupe-news":
+        with db_connection() as conn:
+            if conn is None:
+                sys.exit("Failed to connect to the database")
+            print(f"Deleted {dedupe_news(conn)} duplicate news row(s)")
+    else:
+        sys.exit(f"Unknown command: {command} (expected 'migrate', 'status' or 'dedupe-news')")
@@ -0,0 +1,203 @@
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+
+from governor import LLMUnavailable, get_governor
+from metrics import LLM_ERRORS, LLM_REQUEST_SECONDS, record_usage
+
+# Task -> model routing. Override any part with MODEL_ROUTES, e.g.
+# MODEL_ROUTES='{"suggestions": {"model": "gemini-2.0-flash", "timeout": 30}}'
+DEFAULT_ROUTES = {
+    "diagnosis": {
+        "model": "gemini-2.5-pro-preview-05-06",
+        "fallback": "gemini-2.0-flash",
+        "timeout": 90,
+        "generation_config": {},
+    },
+    "suggestions": {
+        "model": "gemini-2.5-pro-preview-05-06",
+        "fallback": "gemini-2.0-flash",
+        "timeout": 90,
+        "generation_config": {},
+    },
+    "demand": {
+        "model": "gemini-2.5-pro-preview-05-06",
+        "fallback": "gemini-2.0-flash",
+        "timeout": 120,
+        "generation_config": {},
+    },
+    "news_insight": {
+        "model": "gemini-2.0-flash",
+        "fallback": None,
+        "timeout": 60,
+        "generation_config": {},
+    },
+    "link_summary": {
+        "model": "gemini-2.5-pro-preview-05-06",
+        "fallback": "gemini-2.0-flash",
+        "timeout": 90,
+        "generation_config": {},
+    },
+}
+
+
+@lru_cache(maxsize=None)
+def fallback_errors():
+    """Errors that mean "this model is slow or unavailable right now", worth a second model."""
+    from google.api_core import exceptions as api_exceptions
+
+    return (
+        api_exceptions.DeadlineExceeded,
+        api_exceptions.ServiceUnavailable,
+        api_exceptions.InternalServerError,
+        api_exceptions.ResourceExhausted,
+        TimeoutError,
+        # Circuit open or throttled for this model by the governor
+        LLMUnavailable,
+    )
+
+
+@lru_cache(maxsize=None)
+def routes():
+    """DEFAULT_ROUTES with MODEL_ROUTES applied; read on first use, after app.configure() loaded .env."""
+    loaded = {task: dict(route) for task, route in DEFAULT_ROUTES.items()}
+    overrides = json.loads(os.getenv("MODEL_ROUTES", "{}"))
+    for task, override in overrides.items():
+        loaded.setdefault(task, {"fallback": None, "timeout": 60, "generation_config": {}}).update(override)
+    return loaded
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_api_key = None
+_genai = None
+
+
+def configure(api_key):
+    """Set the Gemini API key. The SDK itself is imported and configured on first use."""
+    global _api_key, _genai
+    with _clients_lock:
+        _api_key = api_key
+        _genai = None
+
+
+def get_route(task):
+    try:
+        return routes()[task]
+    except KeyError:
+        raise KeyError(f"No model route configured for task '{task}'")
+
+
+def merged_config(task, generation_config=None):
+    """The task's generation config with per-call overrides applied on top."""
+    config = dict(get_route(task).get("generation_config") or {})
+    config.update(generation_config or {})
+    return config
+
+
+def get_client(model_name, generation_config=None):
+    """A GenerativeModel for this name and config, built once per process and reused."""
+    key = (model_name, json.dumps(generation_config or {}, sort_keys=True))
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                if os.getenv("GEMINI_FAKE", "0") == "1":
+                    # Load tests and offline runs only; never imported in production
+                    from fake_gemini import FakeModel as model_class
+                else:
+                    model_class = _load_genai().GenerativeModel
+                client = _clients[key] = model_class(
+                    model_name, generation_config=generation_config or None
+                )
+    return client
+
+
+def _load_genai():
+    # Called with _clients_lock held
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+
+        genai.configure(api_key=_api_key)
+        _genai = genai
+    return _genai
+
+
+def _candidates(task):
+    route = get_route(task)
+    return [name for name in (route["model"], route.get("fallback")) if name]
+
+
+def generate(task, contents, generation_config=None, stream=False):
+    """Run `task` on its primary model, falling back to the secondary one on timeouts/outages."""
+    route = get_route(task)
+    config = merged_config(task, generation_config)
+    candidates = _candidates(task)
+    for i, model_name in enumerate(candidates):
+        started = time.perf_counter()
+        try:
+            client = get_client(model_name, config)
+            response = get_governor(model_name).call(lambda: client.generate_content(
+                contents, stream=stream, request_options={"timeout": route["timeout"]}
+            ))
+        except Exception as e:
+            LLM_ERRORS.inc(model=model_name, error=type(e).__name__)
+            if not isinstance(e, fallback_errors()) or i == len(candidates) - 1:
+                raise
+            print(f"Model {model_name} failed for {task} ({e}); falling back to {candidates[i + 1]}")
+            continue
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, task=task, model=model_name)
+        if not stream:
+            record_usage(model_name, response)
+        return response
+
+
+def stream(task, contents, generation_config=None):
+    """Yield (text_chunk, response) pairs; falls back only if the primary fails before its first chunk."""
+    route = get_route(task)
+    config = merged_config(task, generation_config)
+    candidates = _candidates(task)
+    for i, model_name in enumerate(candidates):
+        started = False
+        began = time.perf_counter()
+        try:
+            client = get_client(model_name, config)
+            response = None
+
+            def open_stream():
+                nonlocal response
+                response = client.generate_content(
+                    contents, stream=True, request_options={"timeout": route["timeout"]}
+                )
+                return response
+
+            for chunk in get_governor(model_name).stream(open_stream):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. safety-only chunks)
+                    continue
+                if text:
+                    started = True
+                    yield text, response
+        except Exception as e:
+            LLM_ERRORS.inc(model=model_name, error=type(e).__name__)
+            if started or not isinstance(e, fallback_errors()) or i == len(candidates) - 1:
+                raise
+            print(f"Model {model_name} failed for {task} ({e}); falling back to {candidates[i + 1]}")
+            continue
+        LLM_REQUEST_SECONDS.observe(time.perf_counter() - began, task=task, model=model_name)
+        record_usage(model_name, response)
+        return
+
+
+def warm_up():
+    """Build the client for every configured route ahead of the first request."""
+    for task in routes():
+        config = merged_config(task)
+        for model_name in _candidates(task):
+            get_client(model_name, config)
@@ -1,35 +1,64 @@
-import requests
-from bs4 import BeautifulSoup
-import time, os
-import google.generativeai as genai
-from dotenv import load_dotenv
-headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-# Load environment variables
-load_dotenv()
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables. Please set it.")
-genai.configure(api_key=API_KEY)
-
-
-def generate_insights_from_text(text):
-      
-    """Uses a PIL Image object with the Gemini API."""
-    model = genai.GenerativeModel('gemini-2.0-flash')
-    text_prompt = f"""**Role:** Act as an agricultural advisor.
-**Task:** Analyze the news article below ({text}) to provide practical insights for farmers.
+"""News scrapers and article insights.
+
+Only the daily news job imports this module. Gemini is configured by the app
+(configure() in app.py), not here. GMA pages whose article body is rendered
+client-side go through BrowserPool, which needs selenium and Chrome/Chromium;
+without them those articles are skipped.
+"""
+import os
+import json
+import queue
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
 
-**Focus specifically on:**
+import http_client
+from crawler import crawl, get_limiter
+from llm_cache import generate_content
+from metrics import SCRAPE_RENDER_SECONDS
+from page_parser import Field, Page, parse, scrape
+
+# Rough token budget for the article text packed into one batched insight request
+INSIGHT_BATCH_TOKEN_BUDGET = int(os.getenv("INSIGHT_BATCH_TOKEN_BUDGET", "24000"))
+
+# Headless browsers kept alive per scrape run for JavaScript-rendered pages
+BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+# Pages one browser session renders before it is replaced
+BROWSER_PAGES_PER_SESSION = int(os.getenv("BROWSER_PAGES_PER_SESSION", "25"))
+BROWSER_PAGE_TIMEOUT = float(os.getenv("BROWSER_PAGE_TIMEOUT", "30"))
+# Static article text shorter than this means the body is rendered client-side
+GMA_MIN_ARTICLE_CHARS = int(os.getenv("GMA_MIN_ARTICLE_CHARS", "300"))
+GMA_LISTING_URL = os.getenv("GMA_LISTING_URL", "https://www.gmanetwork.com/news/topstories/agriculture/")
+
+# Requests the browser never makes: images, fonts, ads and trackers
+BROWSER_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.mp4",
+    "*doubleclick.net*", "*googlesyndication.com*", "*googleadservices.com*", "*adservice.google.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*facebook.net*", "*scorecardresearch.com*",
+    "*chartbeat.com*", "*taboola.com*", "*outbrain.com*",
+]
+
+INSIGHT_FOCUS = """**Focus specifically on:**
 1.  **Crop Security:** Identify any information related to threats (pests, diseases, climate, supply chain issues) or opportunities (new protections, resilience strategies) for crops.
 2.  **Farming Practices:** Does the news suggest any need to adapt cultivation methods, technology use, or resource management?
 3.  **Market Implications:** How might this news affect crop prices, demand, or input costs?
 4.  **Actionable Information:** What is the most crucial takeaway a farmer could act upon or needs to monitor?
 dont add stuffs like this ""Here's an agricultural advisor's assessment of the news article:"
-**Output:** Synthesize your findings into a concise paragraph (20 words) summarizing the most critical points for a farmer reading this news.
+"""
+
+
+def generate_insights_from_text(text, cache=True):
+      
+    """Uses a PIL Image object with the Gemini API."""
+    text_prompt = f"""**Role:** Act as an agricultural advisor.
+**Task:** Analyze the news article below ({text}) to provide practical insights for farmers.
+
+{INSIGHT_FOCUS}**Output:** Synthesize your findings into a concise paragraph (20 words) summarizing the most critical points for a farmer reading this news.
 """
     contents = text_prompt
     try:
-        response = model.generate_content(contents)
+        response = generate_content("news_insight", contents, cache=cache)
         result = {"response": response.text}
         if response.prompt_feedback and response.prompt_feedback.block_reason:
             result["block_reason"] = response.prompt_feedback.block_reason
@@ -41,78 +70,414 @@ dont add stuffs like this ""Here's an agricultural advisor's assessment of the n
         return result
     except Exception as e:
         return {"error": f"An API error occurred: {e}"}
-    
+
+
+def _estimate_tokens(text):
+    # ~4 characters per token is close enough for packing decisions
+    return len(text) // 4 + 1
+
+
+def _pack_batches(texts, token_budget):
+    """Greedily group article indices so each group's text fits the token budget."""
+    batches, current, used = [], [], 0
+    for i, text in enumerate(texts):
+        cost = _estimate_tokens(text)
+        if current and used + cost > token_budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _generate_insights_for_batch(texts):
+    """One structured-output request for several articles. Returns None if the answer is unusable."""
+    articles = "\n\n".join(f"### Article {i}\n{text}" for i, text in enumerate(texts))
+    text_prompt = f"""**Role:** Act as an agricultural advisor.
+**Task:** Analyze each of the {len(texts)} news articles below to provide practical insights for farmers.
+
+{INSIGHT_FOCUS}**Output:** For every article, synthesize your findings into a concise paragraph (20 words) summarizing the most critical points for a farmer reading that news.
+Respond only with a JSON array containing one object per article, in the form {{"id": <article number>, "summary": "<paragraph>"}}.
+
+{articles}
+"""
+    # API errors (quota, outage, open breaker) propagate; only an unusable answer falls back
+    response = generate_content(
+        "news_insight",
+        text_prompt,
+        generation_config={"response_mime_type": "application/json"},
+    )
+    try:
+        answer = json.loads(response.text)
+    except ValueError as e:
+        print(f"Batched insight answer is not usable JSON: {e}")
+        return None
+
+    if not isinstance(answer, list):
+        return None
+    summaries = {}
+    for item in answer:
+        if not isinstance(item, dict):
+            return None
+        article_id, summary = item.get("id"), item.get("summary")
+        if isinstance(article_id, str) and article_id.isdigit():
+            article_id = int(article_id)
+        if not isinstance(summary, str) or not summary.strip():
+            return None
+        summaries[article_id] = summary.strip()
+    if set(summaries) != set(range(len(texts))):
+        return None
+    return [{"response": summaries[i]} for i in range(len(texts))]
+
+
+def generate_insights_batch(texts, token_budget=None):
+    """Insights for several articles, packed into as few Gemini requests as the token budget allows.
+
+    Returns one result per text, in order, shaped like generate_insights_from_text().
+    A batch whose answer is malformed or incomplete falls back to per-article calls.
+    A batch whose request fails gets an error result for every article instead,
+    and after an overload error (quota, outage, open breaker) the remaining
+    batches are not attempted either, so a throttled API is not called once per article.
+    """
+    from governor import retry_after
+
+    token_budget = token_budget or INSIGHT_BATCH_TOKEN_BUDGET
+    results = [None] * len(texts)
+    overloaded = None
+    for batch in _pack_batches(texts, token_budget):
+        if overloaded is not None:
+            for i in batch:
+                results[i] = {"error": f"An API error occurred: {overloaded}"}
+            continue
+        batch_results = None
+        if len(batch) > 1:
+            try:
+                batch_results = _generate_insights_for_batch([texts[i] for i in batch])
+            except Exception as e:
+                print(f"Batched insight request for {len(batch)} articles failed: {e}")
+                if retry_after(e) is not None:
+                    overloaded = e
+                batch_results = [{"error": f"An API error occurred: {e}"} for _ in batch]
+            if batch_results is None:
+                print(f"Falling back to per-article insights for {len(batch)} articles")
+        if batch_results is None:
+            batch_results = [generate_insights_from_text(texts[i]) for i in batch]
+        for i, result in zip(batch, batch_results):
+            results[i] = result
+    return results
+
+
+def summarize_articles(articles):
+    """Attach insights to scraped (text, link, title, image_url) tuples.
+
+    Returns a list of [insight, link, title, image_url], the shape daily_news stores.
+    """
+    insights = generate_insights_batch([text for text, _, _, _ in articles])
+    return [
+        [insight, link, title, image_url]
+        for insight, (_, link, title, image_url) in zip(insights, articles)
+    ]
+
+
+# Where each source keeps its article links and article fields. `keep` limits
+# parsing to those tags and their subtrees; the rest of the page is skipped.
+SELECTORS = {
+    "da": {
+        "listing": Page(
+            keep={"name": "a", "attrs": {"class": "read-more"}},
+            fields={"links": Field("a.read-more[href]", attr="href", many=True)},
+        ),
+        "article": Page(
+            keep={"name": ["article", "h1", "img"]},
+            fields={
+                "title": Field("h1.title"),
+                "text": Field("article"),
+                "image": Field("img.attachment-post-thumbnail", attr="src"),
+            },
+        ),
+    },
+    "rappler": {
+        "listing": Page(
+            keep={"name": "figure", "attrs": {"class": "archive-article-image"}},
+            fields={"articles": Field("figure.archive-article-image", many=True, fields={
+                "link": Field("a[href]", attr="href"),
+                "image": Field("a img[src]", attr="src"),
+            })},
+        ),
+        "article": Page(
+            keep={"name": ["h1", "div"]},
+            fields={
+                "title": Field("h1"),
+                "text": Field("div.entry-content p", many=True, join="\n"),
+            },
+        ),
+    },
+    "gma": {
+        # Story URLs end in /story/; the listing page may be rendered client-side
+        "listing": Page(
+            keep={"name": "a"},
+            fields={"links": Field("a[href*='/story/']", attr="href", many=True)},
+        ),
+        "article": Page(
+            keep={"name": ["h1", "div", "meta"]},
+            fields={
+                "title": Field("h1"),
+                "text": Field("div.article-body p, div.story_main p, div.main-article-body p", many=True, join="\n"),
+                "image": Field("meta[property='og:image']", attr="content"),
+            },
+        ),
+    },
+}
+
+
+DA_LISTING_URL = "https://www.da.gov.ph/category/news/"
+RAPPLER_LISTING_URL = "https://www.rappler.com/topic/agriculture-philippines/"
+
+
+def _listing_page_url(base):
+    # WordPress-style pagination: page 1 is the bare listing, then /page/<n>/
+    return lambda page: base if page == 1 else f"{base}page/{page}/"
+
+
+def _da_listing(content, url):
+    return [(urljoin(url, link), None) for link in scrape(content, SELECTORS["da"]["listing"], "da")["links"]]
+
+
+def _da_article(link, image_url, content):
+    article = scrape(content, SELECTORS["da"]["article"], "da")
+    if not article["text"]:
+        return None
+    return (article["text"], link, article["title"], article["image"] or image_url)
+
+
+def _rappler_listing(content, url):
+    listing = scrape(content, SELECTORS["rappler"]["listing"], "rappler")
+    return [(urljoin(url, a["link"]), a["image"]) for a in listing["articles"] if a["link"]]
+
+
+def _rappler_article(link, image_url, content):
+    article = scrape(content, SELECTORS["rappler"]["article"], "rappler")
+    if not article["text"]:
+        return None
+    return (article["text"], link, article["title"], image_url)
+
+
 #https://www.da.gov.ph/category/news/
-def da_news_scraper():
-    url = "https://www.da.gov.ph/category/news/"
-    response = requests.get(url, headers=headers)
-
-    soup = BeautifulSoup(response.content, 'html.parser')
-    post_details = soup.findAll('a', class_='read-more')
-   
-       
-
-    link = post_details[3].get('href')
-    response2 = requests.get(link, headers=headers)
-    soup2 = BeautifulSoup(response2.content, 'html.parser')
-    article = soup2.find('article')
-    title = soup2.find('h1',class_="title").text
-    image = soup2.find('img', class_='attachment-post-thumbnail').get('src')
-    return [generate_insights_from_text(article.text), link,title, image]
-    
+def da_news_scraper(seen=None, max_pages=None):
+    articles = crawl("da", _listing_page_url(DA_LISTING_URL), _da_listing, _da_article, seen, max_pages)
+    return summarize_articles(articles) if articles else None
+
 
 #https://www.rappler.com/topic/agriculture-philippines/
 #https://www.rappler.com/topic/agriculture-philippines/page/2/
+def rappler_news_scraper(seen=None, max_pages=None):
+    articles = crawl("rappler", _listing_page_url(RAPPLER_LISTING_URL), _rappler_listing, _rappler_article,
+                     seen, max_pages)
+    return summarize_articles(articles) if articles else None
+
+
+class BrowserPool:
+    """Up to `size` headless Chrome sessions shared by one scrape run.
+
+    Sessions start on first use and are reused across pages; each is
+    replaced after `pages_per_session` pages so a long run does not keep
+    growing one browser's memory. Close the pool (or use it as a context
+    manager) when the run ends. Needs selenium and a Chrome/Chromium install;
+    the Docker image ships neither, so there the first start fails, the pool
+    marks itself unavailable and scrapers keep to plain HTTP.
+    """
+
+    def __init__(self, size=None, pages_per_session=None):
+        self.size = size or BROWSER_POOL_SIZE
+        self.pages_per_session = pages_per_session or BROWSER_PAGES_PER_SESSION
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.start_error = None
+        self.started = self.rendered = 0
+
+    @property
+    def available(self):
+        return self.start_error is None and not self._closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _start(self):
+        from selenium import webdriver
+
+        options = webdriver.ChromeOptions()
+        for arg in ("--headless=new", "--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu",
+                    "--disable-extensions", "--blink-settings=imagesEnabled=false"):
+            options.add_argument(arg)
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        # The DOM is enough; do not wait for every subresource to load
+        options.page_load_strategy = "eager"
+        driver = webdriver.Chrome(options=options)
+        driver.set_page_load_timeout(BROWSER_PAGE_TIMEOUT)
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BROWSER_BLOCKED_URLS})
+        with self._lock:
+            self.started += 1
+        return {"driver": driver, "pages": 0}
+
+    @staticmethod
+    def _quit(session):
+        try:
+            session["driver"].quit()
+        except Exception as e:
+            print(f"Error closing browser session: {e}")
+
+    def render(self, url, wait_for=None):
+        """The page source of `url` after its scripts ran; waits for the `wait_for` CSS selector if given."""
+        host = urlsplit(url).netloc
+        with self._slots:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            if self.start_error is not None:
+                raise RuntimeError(f"No browser available: {self.start_error}")
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                try:
+                    session = self._start()
+                except Exception as e:
+                    # No Chrome (or no selenium) here: do not retry for every page
+                    print(f"Could not start a headless browser, continuing without one: {e}")
+                    self.start_error = e
+                    raise
+            started = time.perf_counter()
+            try:
+                session["driver"].get(url)
+                if wait_for:
+                    self._wait_for(session["driver"], wait_for)
+                html = session["driver"].page_source
+            except Exception:
+                SCRAPE_RENDER_SECONDS.observe(time.perf_counter() - started, host=host, status="error")
+                self._quit(session)
+                raise
+            SCRAPE_RENDER_SECONDS.observe(time.perf_counter() - started, host=host, status="ok")
+            with self._lock:
+                self.rendered += 1
+            session["pages"] += 1
+            if self._closed or session["pages"] >= self.pages_per_session:
+                self._quit(session)
+            else:
+                self._idle.put(session)
+            return html
+
+    @staticmethod
+    def _wait_for(driver, selector):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        try:
+            WebDriverWait(driver, BROWSER_PAGE_TIMEOUT).until(
+                expected_conditions.presence_of_element_located((By.CSS_SELECTOR, selector))
+            )
+        except TimeoutException:
+            # Take whatever rendered; the caller decides if it is enough
+            pass
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def _gma_listing(pool):
+    def parse_listing(content, url):
+        page = SELECTORS["gma"]["listing"]
+        links = scrape(content, page, "gma")["links"]
+        if not links and pool.available:
+            # The listing is filled in by JavaScript
+            with get_limiter(urlsplit(url).netloc).slot():
+                links = scrape(pool.render(url, wait_for=page.fields["links"].selector), page, "gma")["links"]
+        unique = dict.fromkeys(urljoin(url, link) for link in links)
+        return [(link, None) for link in unique]
+    return parse_listing
+
+
+def _gma_article(pool, counts):
+    # Articles are parsed on the crawler's worker threads
+    lock = threading.Lock()
+
+    def count(kind):
+        with lock:
+            counts[kind] += 1
+
+    def parse_article(link, image_url, content):
+        page = SELECTORS["gma"]["article"]
+        article = scrape(content, page, "gma")
+        if len(article["text"] or "") < GMA_MIN_ARTICLE_CHARS and pool.available:
+            try:
+                with get_limiter(urlsplit(link).netloc).slot():
+                    html = pool.render(link, wait_for=page.fields["text"].selector)
+            except Exception as e:
+                print(f"Could not render GMA article {link}, keeping its static HTML: {e}")
+            else:
+                rendered = scrape(html, page, "gma")
+                if rendered["text"]:
+                    count("browser")
+                    return (rendered["text"], link, rendered["title"], rendered["image"] or image_url)
+        if not article["text"]:
+            return None
+        count("http")
+        return (article["text"], link, article["title"], article["image"] or image_url)
+    return parse_article
+
+
+#https://www.gmanetwork.com/news/topstories/agriculture/
+def gma_news_scraper(seen=None):
+    """GMA articles, from the static HTML when it has the body and from a pooled headless browser otherwise.
+
+    Only the first listing page is read: GMA has no WordPress-style /page/<n>/
+    URLs, and older stories are loaded by the page's own scripts.
+    """
+    counts = {"http": 0, "browser": 0}
+    with BrowserPool() as pool:
+        articles = crawl("gma", lambda page: GMA_LISTING_URL, _gma_listing(pool), _gma_article(pool, counts),
+                         seen, max_pages=1)
+    print(f"GMA articles: {counts['http']} from static HTML, {counts['browser']} rendered "
+          f"({pool.started} browser session(s) started)")
+    return summarize_articles(articles) if articles else None
+
 
-def rappler_news_scraper():
-    url = "https://www.rappler.com/topic/agriculture-philippines/page/7/"
-    response = requests.get(url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
-    figure = soup.find('figure', class_='archive-article-image')
-    if figure:
-        a_tag = figure.find('a')
-        if a_tag and a_tag.has_attr('href'):
-            link = a_tag['href']
-            print("Article link:", link)
-            # You can also get the image URL if needed:
-            img_tag = a_tag.find('img')
-            if img_tag and img_tag.has_attr('src'):
-                image_url = img_tag['src']
-                print("Image URL:", image_url)
-            response2 = requests.get(link, headers=headers)
-            soup2 = BeautifulSoup(response2.content, 'html.parser')
-            title = soup2.find('h1').text
-            container = soup2.find('div', class_='entry-content')
-            if container:
-                paragraphs = container.find_all('p')
-                # Extract text from each <p> tag
-                texts = [p.get_text(strip=True) for p in paragraphs]
-                # Join all paragraphs into a single string if needed
-                full_text = "\n".join(texts)
-                res = generate_insights_from_text(full_text)
-                print("THIS CAME FROM GEMINI",res)
-                #print(title)
-                return [res,link,title,image_url]  # or return both link and image_url as needed
 #https://www.da.gov.ph/aggie-trends/
 def da_aggie_trends_scraper():
     url = "https://www.da.gov.ph/aggie-trends/"
     pdf_url= "https://drive.google.com/file/d/1REUw0nrYgpQbACezcYUkbrdQnUJzsOqq/view"
 
-    response = requests.get(pdf_url, headers=headers)
-    soup = BeautifulSoup(response.content, 'html.parser')
+    response = http_client.get(pdf_url)
+    soup = parse(response.content, None, "da")
     print(soup)
 def check(): #https://www.da.gov.ph/ship-with-35000-bags-of-well-milled-nfa-rice-arrives-in-cebu/
-    model = genai.GenerativeModel('gemini-2.5-pro-preview-05-06')
     text_prompt = f"""give me summary of this link  https://www.da.gov.ph/ship-with-35000-bags-of-well-milled-nfa-rice-arrives-in-cebu/ """
     contents = text_prompt
     try:
-        response = model.generate_content(contents)
+        response = generate_content("link_summary", contents, cache=False)
         result = {"response": response.text}
         print(result)
     except Exception as e:
         return {"error": f"An API error occurred: {e}"}
     
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+    import models
+
+    load_dotenv()
+    models.configure(os.getenv("GOOGLE_API_KEY"))
     rappler_news_scraper()
     #da_aggie_trends_scraper()
     #check()
\ No newline at end of file
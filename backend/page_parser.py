@@ -0,0 +1,87 @@
+"""Partial HTML parsing for the scrapers.
+
+A Page says which tags to keep while parsing (everything else is skipped by a
+SoupStrainer, so BeautifulSoup never builds it) and where each field lives, as
+CSS selectors. Pages are parsed with lxml when it is installed and fall back
+to the much slower html.parser otherwise.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+from metrics import SCRAPE_PARSE_SECONDS
+
+# keep: SoupStrainer arguments, e.g. {"name": ["h1", "article"]}; None parses the whole page
+Page = namedtuple("Page", ["keep", "fields"])
+
+
+class Field(namedtuple("Field", ["selector", "attr", "many", "join", "fields"])):
+    """Where one value lives in a page.
+
+    selector  CSS selector (relative to the enclosing match for nested fields)
+    attr      read this attribute instead of the element's text
+    many      return every match as a list instead of the first one
+    join      with many, join the texts with this separator into one string
+    fields    with many, return a dict of these nested fields for every match
+    """
+
+    def __new__(cls, selector, attr=None, many=False, join=None, fields=None):
+        return super().__new__(cls, selector, attr, many, join, fields)
+
+
+@lru_cache(maxsize=None)
+def parser_name():
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        print("lxml is not installed; parsing pages with html.parser")
+        return "html.parser"
+
+
+@lru_cache(maxsize=None)
+def _strainer(keep):
+    from bs4 import SoupStrainer
+
+    name, attrs = keep
+    return SoupStrainer(list(name) if isinstance(name, tuple) else name, attrs=dict(attrs))
+
+
+def _strainer_key(keep):
+    """A hashable form of the keep arguments so strainers are built once."""
+    name = keep.get("name")
+    return (tuple(name) if isinstance(name, list) else name, tuple(sorted(keep.get("attrs", {}).items())))
+
+
+def parse(content, page, source, parser=None):
+    """Parse the parts of `content` that `page` keeps; times the parse under `source`."""
+    from bs4 import BeautifulSoup
+
+    parse_only = _strainer(_strainer_key(page.keep)) if page is not None and page.keep else None
+    with SCRAPE_PARSE_SECONDS.time(source=source):
+        return BeautifulSoup(content, parser or parser_name(), parse_only=parse_only)
+
+
+def _value(element, field):
+    if field.attr:
+        return element.get(field.attr)
+    return element.get_text(strip=True) if field.many else element.get_text()
+
+
+def extract_field(soup, field):
+    if not field.many:
+        element = soup.select_one(field.selector)
+        return _value(element, field) if element is not None else None
+    matches = soup.select(field.selector)
+    if field.fields:
+        return [{name: extract_field(match, sub) for name, sub in field.fields.items()} for match in matches]
+    values = [v for v in (_value(match, field) for match in matches) if v]
+    return field.join.join(values) if field.join is not None else values
+
+
+def extract(soup, page):
+    """{field name: value} for every field of `page`; missing single fields are None."""
+    return {name: extract_field(soup, field) for name, field in page.fields.items()}
+
+
+def scrape(content, page, source, parser=None):
+    return extract(parse(content, page, source, parser), page)
@@ -0,0 +1,269 @@
+import json
+
+from pagination import encode_cursor
+
+
+class NewsRepository:
+    """Reads from the `news` table for routes and background jobs alike."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def page(self, limit, after=None, include_description=True):
+        """One page of news, newest first, after the (created_at, id) keyset `after`.
+
+        Returns (items, next_cursor); next_cursor is None on the last page.
+        """
+        columns = "id, url, title, image_url, created_at" + (", description" if include_description else "")
+        where = "WHERE (created_at, id) < (%s, %s)" if after else ""
+        with self.conn.cursor() as cursor:
+            # One extra row tells us whether there is a next page
+            cursor.execute(
+                f"SELECT {columns} FROM news {where} ORDER BY created_at DESC, id DESC LIMIT %s;",
+                (*(after or ()), limit + 1),
+            )
+            rows = cursor.fetchall()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        items = []
+        for row in rows:
+            item = {"id": row[0], "url": row[1], "title": row[2], "image_url": row[3]}
+            if include_description:
+                item["description"] = row[5]
+            items.append(item)
+        next_cursor = encode_cursor(rows[-1][4], rows[-1][0]) if has_more else None
+        return items, next_cursor
+
+    def latest(self, n=20):
+        """The `n` newest articles, shaped like the /get_news list."""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, description, url, title, image_url FROM news ORDER BY created_at DESC, id DESC LIMIT %s;",
+                (n,),
+            )
+            rows = cursor.fetchall()
+        return [
+            {"id": row[0], "description": row[1], "url": row[2], "title": row[3], "image_url": row[4]}
+            for row in rows
+        ]
+
+
+class DemandRepository:
+    """Demand snapshots (`demand`) and their per-crop rows (`crop_price`)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def add_snapshot(self, document):
+        """Store a parsed demand document and one crop_price row per crop. The caller commits."""
+        from psycopg2.extras import execute_values
+
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO demand (document) VALUES (%s::jsonb) RETURNING id;", (json.dumps(document),)
+            )
+            snapshot_id = cursor.fetchone()[0]
+            rows = [
+                (snapshot_id, entry["crop"], direction, entry["price"], entry["analysis"])
+                for direction, entries in document.items()
+                for entry in entries
+            ]
+            if rows:
+                execute_values(
+                    cursor,
+                    "INSERT INTO crop_price (snapshot_id, crop, direction, price, analysis) VALUES %s",
+                    rows,
+                )
+        return snapshot_id
+
+    def latest(self):
+        """The newest snapshot as {id, created_at, document, json}, or None."""
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT id, created_at, document, json FROM demand ORDER BY id DESC LIMIT 1;")
+            row = cursor.fetchone()
+        if not row:
+            return None
+        return {"id": row[0], "created_at": row[1], "document": row[2], "json": row[3]}
+
+    def prices(self, snapshot_id, crop=None, direction=None):
+        """crop_price rows of one snapshot, optionally for one crop and/or direction."""
+        where, params = ["snapshot_id = %s"], [snapshot_id]
+        if crop:
+            where.append("lower(crop) = lower(%s)")
+            params.append(crop)
+        if direction:
+            where.append("direction = %s")
+            params.append(direction)
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT crop, direction, price, analysis FROM crop_price WHERE "
+                + " AND ".join(where) + " ORDER BY id;",
+                params,
+            )
+            rows = cursor.fetchall()
+        return [
+            {"crop": row[0], "direction": row[1], "price": float(row[2]) if row[2] is not None else None,
+             "analysis": row[3]}
+            for row in rows
+        ]
+
+    def history(self, crop, limit):
+        """The crop's price and direction in its `limit` newest snapshots, newest first."""
+        with self.conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT c.snapshot_id, d.created_at, c.direction, c.price, c.analysis"
+                " FROM crop_price c JOIN demand d ON d.id = c.snapshot_id"
+                " WHERE lower(c.crop) = lower(%s) ORDER BY c.snapshot_id DESC LIMIT %s;",
+                (crop, limit),
+            )
+            rows = cursor.fetchall()
+        return [
+            {"snapshot_id": row[0], "created_at": row[1].isoformat() if row[1] else None, "direction": row[2],
+             "price": float(row[3]) if row[3] is not None else None, "analysis": row[4]}
+            for row in rows
+        ]
+
+
+class PlantAnalyticsRepository:
+    """Per-plant analytics computed in SQL over plant_log_daily (see migration 7)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _fetchall(self, sql, params):
+        with self.conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def plant(self, plant, days):
+        """Growth, watering, disease and stage analytics for one plant over the last `days` days.
+
+        Returns None if the plant has no logs in that window.
+        """
+        window = (plant, days)
+        totals = self._fetchall(
+            """
+            SELECT SUM(logs), MIN(day), MAX(day), COUNT(*), COUNT(*) FILTER (WHERE watered > 0),
+                   SUM(diseased), SUM(fertilized),
+                   regr_slope(last_height_cm, day - DATE '2000-01-01'),
+                   (array_agg(last_height_cm ORDER BY day) FILTER (WHERE last_height_cm IS NOT NULL))[1],
+                   (array_agg(last_height_cm ORDER BY day DESC) FILTER (WHERE last_height_cm IS NOT NULL))[1]
+            FROM plant_log_daily
+            WHERE plant = %s AND day > CURRENT_DATE - %s
+            """,
+            window,
+        )[0]
+        if not totals[0]:
+            return None
+        logs, first_day, last_day, days_logged, days_watered, diseased, fertilized, slope, first_h, last_h = totals
+
+        watering_gap = self._fetchall(
+            """
+            SELECT AVG(gap) FROM (
+                SELECT day - LAG(day) OVER (ORDER BY day) AS gap
+                FROM plant_log_daily
+                WHERE plant = %s AND day > CURRENT_DATE - %s AND watered > 0
+            ) gaps
+            """,
+            window,
+        )[0][0]
+
+        weekly = self._fetchall(
+            """
+            SELECT date_trunc('week', day)::date AS week, SUM(logs), SUM(diseased), SUM(watered)
+            FROM plant_log_daily
+            WHERE plant = %s AND day > CURRENT_DATE - %s
+            GROUP BY week ORDER BY week
+            """,
+            window,
+        )
+
+        # Consecutive days with the same latest stage collapse into one span (gaps and islands)
+        stages = self._fetchall(
+            """
+            SELECT stage, MIN(day), MAX(day) FROM (
+                SELECT day, last_stage AS stage,
+                       ROW_NUMBER() OVER (ORDER BY day)
+                       - ROW_NUMBER() OVER (PARTITION BY last_stage ORDER BY day) AS island
+                FROM plant_log_daily
+                WHERE plant = %s AND day > CURRENT_DATE - %s AND last_stage IS NOT NULL
+            ) s
+            GROUP BY stage, island ORDER BY MIN(day)
+            """,
+            window,
+        )
+
+        return {
+            "plant": plant,
+            "days": days,
+            "logs": int(logs),
+            "first_log_day": first_day.isoformat(),
+            "last_log_day": last_day.isoformat(),
+            "growth": {
+                "rate_cm_per_day": round(float(slope), 3) if slope is not None else None,
+                "first_height_cm": _float(first_h),
+                "latest_height_cm": _float(last_h),
+            },
+            "watering": {
+                "days_logged": days_logged,
+                "days_watered": days_watered,
+                "share_of_logged_days": round(days_watered / days_logged, 3),
+                "avg_days_between": round(float(watering_gap), 2) if watering_gap is not None else None,
+            },
+            "fertilizer_applications": int(fertilized),
+            "disease": {
+                "incidence": round(int(diseased) / int(logs), 3),
+                "weekly": [
+                    {"week": week.isoformat(), "logs": int(week_logs), "diseased": int(week_diseased),
+                     "incidence": round(int(week_diseased) / int(week_logs), 3), "watered": int(week_watered)}
+                    for week, week_logs, week_diseased, week_watered in weekly
+                ],
+            },
+            "stages": [
+                {"stage": stage, "from": start.isoformat(), "to": end.isoformat()}
+                for stage, start, end in stages
+            ],
+        }
+
+    def overview(self, days):
+        """One summary row per plant with logs in the last `days` days, for the dashboard."""
+        rows = self._fetchall(
+            """
+            SELECT plant, SUM(logs), MAX(day),
+                   COUNT(*) FILTER (WHERE watered > 0), COUNT(*), SUM(diseased),
+                   regr_slope(last_height_cm, day - DATE '2000-01-01'),
+                   (array_agg(last_height_cm ORDER BY day DESC) FILTER (WHERE last_height_cm IS NOT NULL))[1],
+                   (array_agg(last_stage ORDER BY day DESC) FILTER (WHERE last_stage IS NOT NULL))[1]
+            FROM plant_log_daily
+            WHERE day > CURRENT_DATE - %s
+            GROUP BY plant ORDER BY plant
+            """,
+            (days,),
+        )
+        return [
+            {
+                "plant": plant,
+                "logs": int(logs),
+                "last_log_day": last_day.isoformat(),
+                "watered_share_of_logged_days": round(days_watered / days_logged, 3),
+                "disease_incidence": round(int(diseased) / int(logs), 3),
+                "growth_cm_per_day": round(float(slope), 3) if slope is not None else None,
+                "latest_height_cm": _float(height),
+                "stage": stage,
+            }
+            for plant, logs, last_day, days_watered, days_logged, diseased, slope, height, stage in rows
+        ]
+
+
+def _float(value):
+    return float(value) if value is not None else None
+
+
+def latest_news(n=20):
+    """Borrow a pooled connection just long enough to read the newest `n` articles."""
+    from db import db_connection
+
+    with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("Failed to connect to the database")
+        return NewsRepository(conn).latest(n)
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+# Settings (read on first use, so values from .env loaded by app.configure() apply):
+# RESPONSE_CACHE_SIZE (256 entries), RESPONSE_CACHE_TTL (300 s) and
+# RESPONSE_CACHE_REDIS_URL, an optional shared backend so invalidations reach every gunicorn worker.
+#
+# Read-your-writes across processes needs Redis: without it an invalidation
+# only reaches the worker that handled the write, and other workers or
+# instances keep serving their copy until it expires. So without Redis no
+# entry lives longer than RESPONSE_CACHE_LOCAL_TTL (5 s), whatever the view
+# asks for, and gunicorn.conf.py refuses to start more than one worker.
+
+
+class LRUCache:
+    """Small thread-safe LRU with per-entry expiry."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResponseCache:
+    """Read-through cache of serialized GET responses, grouped into namespaces.
+
+    Every key embeds its namespace's generation number; invalidate() bumps
+    the generation, which orphans the old entries until they expire or get
+    evicted. With a Redis URL the entries and generations are shared between
+    processes, and the in-process LRU sits in front of Redis. Settings left as
+    None are read from the environment on first use.
+    """
+
+    def __init__(self, maxsize=None, default_ttl=None, redis_url=None):
+        self._settings = (maxsize, default_ttl, redis_url)
+        self.default_ttl = None
+        self._local = None
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._redis = None
+        self._ttl_cap = None
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    def _setup(self):
+        if self._local is not None:
+            return
+        with self._lock:
+            if self._local is not None:
+                return
+            maxsize, default_ttl, redis_url = self._settings
+            self.default_ttl = default_ttl or int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+            redis_url = os.getenv("RESPONSE_CACHE_REDIS_URL", "") if redis_url is None else redis_url
+            if redis_url:
+                import redis
+                self._redis = redis.Redis.from_url(redis_url)
+            else:
+                self._ttl_cap = int(os.getenv("RESPONSE_CACHE_LOCAL_TTL", "5"))
+                self.default_ttl = min(self.default_ttl, self._ttl_cap)
+            self._local = LRUCache(maxsize or int(os.getenv("RESPONSE_CACHE_SIZE", "256")))
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def _generation(self, namespace):
+        self._setup()
+        if self._redis is not None:
+            try:
+                return int(self._redis.get("apac:cache-gen:" + namespace) or 0)
+            except Exception as e:
+                print(f"Error reading cache generation: {e}")
+        return self._generations.get(namespace, 0)
+
+    def invalidate(self, *namespaces):
+        self._setup()
+        for namespace in namespaces:
+            with self._lock:
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+                self._stats["invalidations"] += 1
+            if self._redis is not None:
+                try:
+                    self._redis.incr("apac:cache-gen:" + namespace)
+                except Exception as e:
+                    print(f"Error invalidating shared cache: {e}")
+
+    def get(self, key):
+        self._setup()
+        entry = self._local.get(key)
+        if entry is None and self._redis is not None:
+            try:
+                raw = self._redis.get("apac:cache:" + key)
+            except Exception as e:
+                print(f"Error reading shared cache: {e}")
+                raw = None
+            if raw:
+                entry = json.loads(raw)
+                self._local.set(key, entry, self.default_ttl)
+        return entry
+
+    def set(self, key, entry, ttl):
+        self._setup()
+        if self._ttl_cap is not None:
+            ttl = min(ttl, self._ttl_cap)
+        self._local.set(key, entry, ttl)
+        if self._redis is not None:
+            try:
+                self._redis.set("apac:cache:" + key, json.dumps(entry), ex=ttl)
+            except Exception as e:
+                print(f"Error writing shared cache: {e}")
+
+    def stats(self):
+        self._setup()
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["local_entries"] = len(self._local)
+        stats["shared_backend"] = self._redis is not None
+        stats["default_ttl"] = self.default_ttl
+        return stats
+
+    def cached(self, namespace, ttl=None):
+        """Decorator for GET views: serve from cache and answer If-None-Match with 304."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = "%s:%d:%s" % (namespace, self._generation(namespace), request.full_path)
+                entry = self.get(key)
+                if entry is None:
+                    self._count("misses")
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body = response.get_data(as_text=True)
+                    entry = {
+                        "body": body,
+                        "mimetype": response.mimetype,
+                        "etag": hashlib.sha1(body.encode("utf-8")).hexdigest(),
+                    }
+                    self.set(key, entry, ttl or self.default_ttl)
+                else:
+                    self._count("hits")
+
+                if request.if_none_match.contains(entry["etag"]):
+                    self._count("not_modified")
+                    response = Response(status=304)
+                else:
+                    response = Response(entry["body"], status=200, mimetype=entry["mimetype"])
+                response.set_etag(entry["etag"])
+                response.headers["Cache-Control"] = "no-cache"
+                return response
+            return wrapper
+        return decorator
+
+
+response_cache = ResponseCache()
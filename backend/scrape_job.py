@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from db import db_connection
+from metrics import SCRAPE_SOURCE_SECONDS
+from seen_urls import SeenUrlIndex, normalize_url
+
+SCRAPE_MAX_WORKERS = int(os.getenv("SCRAPE_MAX_WORKERS", "3"))
+# Seconds a single source may run, counted from when it actually starts
+SCRAPE_SOURCE_TIMEOUT = float(os.getenv("SCRAPE_SOURCE_TIMEOUT", "120"))
+
+INSERT_NEWS_SQL = """
+    INSERT INTO news (description, url, url_key, title, image_url)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT DO NOTHING
+"""
+
+
+def _as_articles(result):
+    """Scrapers return either one [insight, url, title, image_url] or a list of them."""
+    if not result:
+        return []
+    if isinstance(result[0], dict):
+        return [result]
+    return [article for article in result if article]
+
+
+def _store_articles(articles):
+    """Insert one source's articles in their own transaction. Returns (inserted, skipped)."""
+    inserted = skipped = 0
+    with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("Failed to connect to the database")
+        with conn.cursor() as cursor:
+            for insight, url, title, image_url in articles:
+                description = insight.get("response") if insight else None
+                if not description or not title:
+                    skipped += 1
+                    continue
+                url_key = normalize_url(url) if url else None
+                cursor.execute(INSERT_NEWS_SQL, (description, url, url_key, title.strip(), image_url))
+                inserted += cursor.rowcount
+        conn.commit()
+    return inserted, skipped
+
+
+def _load_seen_urls():
+    with db_connection() as conn:
+        if conn is None:
+            raise RuntimeError("Failed to connect to the database")
+        return SeenUrlIndex.load(conn)
+
+
+def _run_source(name, scraper, seen, started_at, abandoned):
+    started_at[name] = time.monotonic()
+    articles = _as_articles(scraper(seen=seen))
+    if abandoned.is_set():
+        return None
+    inserted, skipped = _store_articles(articles)
+    return {
+        "status": "ok" if articles else "empty",
+        "articles": len(articles),
+        "inserted": inserted,
+        "skipped": skipped,
+    }
+
+
+def run_sources(sources, max_workers=None, timeout=None):
+    """Scrape every source concurrently and commit each source's news separately.
+
+    `sources` maps a source name to a scraper that takes a `seen`
+    SeenUrlIndex of URLs already in `news` and skips those articles before
+    fetching them. A source that raises or exceeds `timeout` is reported as
+    such without affecting the others; results that arrive after a timeout
+    are discarded.
+    """
+    max_workers = max_workers or SCRAPE_MAX_WORKERS
+    timeout = SCRAPE_SOURCE_TIMEOUT if timeout is None else timeout
+
+    started_at = {}
+    abandoned = {name: threading.Event() for name in sources}
+    reports = {}
+    job_started = time.monotonic()
+    seen = _load_seen_urls()
+    known_urls = len(seen)
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+    try:
+        pending = {
+            executor.submit(_run_source, name, scraper, seen, started_at, abandoned[name]): name
+            for name, scraper in sources.items()
+        }
+        while pending:
+            done, _ = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = pending.pop(future)
+                elapsed = time.monotonic() - started_at.get(name, job_started)
+                try:
+                    report = future.result()
+                except Exception as e:
+                    print(f"Error scraping {name}: {e}")
+                    report = {"status": "error", "error": str(e)}
+                report["seconds"] = round(elapsed, 3)
+                reports[name] = report
+                SCRAPE_SOURCE_SECONDS.observe(elapsed, source=name, status=report["status"])
+
+            now = time.monotonic()
+            for future, name in list(pending.items()):
+                if name in started_at and now - started_at[name] > timeout:
+                    abandoned[name].set()
+                    future.cancel()
+                    del pending[future]
+                    print(f"Scraping {name} timed out after {timeout}s")
+                    reports[name] = {
+                        "status": "timeout",
+                        "error": f"Timed out after {timeout}s",
+                        "seconds": round(now - started_at[name], 3),
+                    }
+                    SCRAPE_SOURCE_SECONDS.observe(now - started_at[name], source=name, status="timeout")
+    finally:
+        # Do not wait for timed-out scrapers; their results are already abandoned
+        executor.shutdown(wait=False)
+
+    return {
+        "sources": reports,
+        "seconds": round(time.monotonic() - job_started, 3),
+        "known_urls": known_urls,
+        "inserted": sum(r.get("inserted", 0) for r in reports.values()),
+    }
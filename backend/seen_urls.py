@@ -0,0 +1,43 @@
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+
+def normalize_url(url):
+    """Canonical form used to compare article URLs: no fragment, tracking params or trailing slash."""
+    parts = urlsplit(url.strip())
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not k.startswith("utm_")])
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, query, ""))
+
+
+class SeenUrlIndex:
+    """In-memory set of article URLs already stored in `news`.
+
+    Loaded once per scrape run so scrapers can drop known articles right
+    after parsing the listing page, before fetching them or calling Gemini.
+    """
+
+    def __init__(self, urls=()):
+        self._urls = {normalize_url(url) for url in urls if url}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, conn):
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT url FROM news WHERE url IS NOT NULL")
+            return cls(row[0] for row in cursor.fetchall())
+
+    def __contains__(self, url):
+        return normalize_url(url) in self._urls
+
+    def __len__(self):
+        return len(self._urls)
+
+    def claim(self, url):
+        """Mark `url` as seen. Returns False if it already was, so concurrent scrapers skip it."""
+        key = normalize_url(url)
+        with self._lock:
+            if key in self._urls:
+                return False
+            self._urls.add(key)
+            return True
@@ -0,0 +1,33 @@
+import json
+
+from flask import Response, stream_with_context
+
+
+def wants_stream(request):
+    """Streaming is opt-in: ?stream=1 or an Accept: text/event-stream header."""
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events):
+    """Relay a generator of sse_event() strings to the client as they are produced."""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        # X-Accel-Buffering stops nginx-style proxies from holding chunks back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def parse_json_answer(text):
+    """Parse a model answer that should be JSON, tolerating ```json fences. None if it is not JSON."""
+    cleaned = text.replace("```json", "").replace("```", "").strip()
+    try:
+        return json.loads(cleaned)
+    except ValueError:
+        return None
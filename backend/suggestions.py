@@ -0,0 +1,178 @@
+"""Per-plant weekly suggestions that only call the model when a plant has new logs.
+
+Each stored suggestion records the fingerprint of the logs it was built from
+and the last log id it saw. The next run reuses it as long as the plant's
+fingerprint is unchanged; otherwise the prompt carries only the logs added
+since then, a compact summary from plant_log_daily and the previous advice.
+"""
+import hashlib
+import json
+import os
+
+from repositories import PlantAnalyticsRepository
+
+
+# Settings are read when used so values from .env (loaded by app.configure()) apply
+def _max_logs():
+    """At most this many new logs per plant go into one prompt."""
+    return int(os.getenv("WEEKLY_SUGGESTION_MAX_LOGS", "10"))
+
+
+def _summary_days():
+    """Days of history folded into the rolling summary."""
+    return int(os.getenv("WEEKLY_SUGGESTION_SUMMARY_DAYS", "30"))
+
+
+PROMPT_INSTRUCTIONS = (
+    'you are a plant expert and given this data below, what suggestions can you give to optimize plant growth, '
+    'only put the action steps and skip the explanations, limit to 10 words per sentence, use bullet points, '
+    'and do not add necessary sentences like "Here is a step-by-step plan to optimize growth"'
+)
+
+
+def fingerprint(plant, last_log_id):
+    # Logs are insert-only, so the newest id identifies the whole set of a plant's logs
+    return hashlib.sha256(json.dumps([plant, last_log_id]).encode("utf-8")).hexdigest()[:32]
+
+
+def plant_log_heads(conn):
+    """{plant: newest plant_log id} for every plant with logs."""
+    with conn.cursor() as cursor:
+        # One index probe per plant instead of a GROUP BY over all of plant_log
+        cursor.execute("""
+            SELECT p.plant, l.max_id
+            FROM (SELECT DISTINCT plant FROM plant_log_daily) p
+            CROSS JOIN LATERAL (SELECT MAX(id) AS max_id FROM plant_log WHERE plant = p.plant) l
+            WHERE l.max_id IS NOT NULL
+        """)
+        return dict(cursor.fetchall())
+
+
+def latest_suggestions(conn):
+    """{plant: the newest stored suggestion row} for plants that have one."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT DISTINCT ON (plant) plant, id, suggestion, fingerprint, last_log_id, created_at
+            FROM weekly_suggestions
+            WHERE plant IS NOT NULL
+            ORDER BY plant, id DESC
+        """)
+        rows = cursor.fetchall()
+    return {
+        row[0]: {"plant": row[0], "id": row[1], "suggestion": row[2], "fingerprint": row[3],
+                 "last_log_id": row[4], "created_at": row[5]}
+        for row in rows
+    }
+
+
+def _new_logs(conn, plant, after_id):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT log_date, watered, fertilizer_applied, disease, height_cm, growth_stage, note
+            FROM plant_log
+            WHERE plant = %s AND id > %s
+            ORDER BY id DESC
+            LIMIT %s
+        """, (plant, after_id or 0, _max_logs()))
+        rows = cursor.fetchall()
+    return [
+        {
+            "log_date": r[0].isoformat() if hasattr(r[0], "isoformat") else str(r[0]),
+            "watered": r[1],
+            "fertilizer_applied": r[2],
+            "disease": r[3],
+            "height_cm": float(r[4]) if r[4] is not None else None,
+            "growth_stage": r[5],
+            "note": r[6],
+        }
+        for r in reversed(rows)
+    ]
+
+
+def _summary(conn, plant):
+    """A few numbers describing the plant's recent history, from the daily aggregates."""
+    summary_days = _summary_days()
+    analytics = PlantAnalyticsRepository(conn).plant(plant, summary_days)
+    if analytics is None:
+        return None
+    return {
+        "days": summary_days,
+        "logs": analytics["logs"],
+        "growth_cm_per_day": analytics["growth"]["rate_cm_per_day"],
+        "latest_height_cm": analytics["growth"]["latest_height_cm"],
+        "watered_share_of_logged_days": analytics["watering"]["share_of_logged_days"],
+        "disease_incidence": analytics["disease"]["incidence"],
+        "stage": analytics["stages"][-1]["stage"] if analytics["stages"] else None,
+    }
+
+
+def build_prompt(plant, summary, previous, logs):
+    parts = [PROMPT_INSTRUCTIONS, f"Plant: {plant}"]
+    if summary:
+        parts.append(f"Summary of the last {summary['days']} days: {json.dumps(summary)}")
+    if previous:
+        parts.append(f"Previous suggestions (update them, do not repeat what still applies verbatim):\n{previous}")
+    parts.append(f"New logs since then:\n{json.dumps(logs, indent=1)}")
+    return "\n\n".join(parts)
+
+
+def plan_suggestions(conn):
+    """One work item per plant with logs.
+
+    Items for plants whose fingerprint is unchanged have prompt=None and carry
+    the stored suggestion to reuse.
+    """
+    previous = latest_suggestions(conn)
+    items = []
+    for plant, last_log_id in sorted(plant_log_heads(conn).items()):
+        fp = fingerprint(plant, last_log_id)
+        prev = previous.get(plant)
+        item = {"plant": plant, "fingerprint": fp, "last_log_id": last_log_id, "previous": prev, "prompt": None}
+        if prev is None or prev["fingerprint"] != fp:
+            summary = _summary(conn, plant)
+            item["summary"] = summary
+            item["prompt"] = build_prompt(
+                plant, summary, prev["suggestion"] if prev else None,
+                _new_logs(conn, plant, prev["last_log_id"] if prev else None),
+            )
+        items.append(item)
+    return items
+
+
+def store_suggestion(conn, item, suggestion_text):
+    """Save a freshly generated suggestion for item["plant"]. The caller commits."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO weekly_suggestions (suggestion, plant, fingerprint, last_log_id, summary)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING id
+        """, (suggestion_text, item["plant"], item["fingerprint"], item["last_log_id"],
+              json.dumps(item.get("summary"))))
+        return cursor.fetchone()[0]
+
+
+def combine_suggestions(suggestions):
+    """One text for clients that show a single suggestion, one section per plant."""
+    return "\n\n".join(f"{s['plant']}:\n{s['suggestion']}" for s in suggestions)
+
+
+def current_suggestions(conn):
+    """The newest suggestion of every plant, shaped for /get_weekly_suggestion; None if there are none.
+
+    Falls back to the newest all-plants row written before suggestions were per plant.
+    """
+    latest = sorted(latest_suggestions(conn).values(), key=lambda s: s["plant"])
+    if latest:
+        return {
+            "id": max(s["id"] for s in latest),
+            "suggestion": combine_suggestions(latest),
+            "plants": [
+                {"plant": s["plant"], "id": s["id"], "suggestion": s["suggestion"],
+                 "created_at": s["created_at"].isoformat() if s["created_at"] else None}
+                for s in latest
+            ],
+        }
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT id, suggestion FROM weekly_suggestions ORDER BY created_at DESC LIMIT 1;")
+        row = cursor.fetchone()
+    return {"id": row[0], "suggestion": row[1]} if row else None
@@ -0,0 +1,50 @@
+"""ConnectionPool limits and db_connection() when the pool is exhausted, with fake connections."""
+import time
+
+import pytest
+
+import db
+
+TIMEOUT = 0.05
+
+
+class FakeConn:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(db.ConnectionPool, "_connect", lambda self: FakeConn())
+    pool = db.ConnectionPool(0, 1, TIMEOUT, healthcheck_after=60)
+    monkeypatch.setattr(db, "_pool", pool)
+    return pool
+
+
+def test_checkout_times_out_when_every_connection_is_in_use(pool):
+    pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(db.PoolTimeout):
+        pool.getconn()
+    assert time.monotonic() - started >= TIMEOUT
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_db_connection_yields_none_when_the_pool_is_exhausted(pool):
+    held = pool.getconn()
+    with db.db_connection() as conn:
+        assert conn is None
+    assert pool.stats()["in_use"] == 1
+
+    # Freed connections are handed out again
+    pool._discard(held)
+    assert pool.getconn() is not held
+
+
+def test_invalid_pool_sizes_are_rejected():
+    with pytest.raises(ValueError):
+        db.ConnectionPool(2, 1, TIMEOUT, healthcheck_after=60)
+    with pytest.raises(ValueError):
+        db.ConnectionPool(0, 0, TIMEOUT, healthcheck_after=60)
@@ -0,0 +1,58 @@
+"""parse_demand(): price cleanup and the entries it must drop rather than store."""
+import json
+
+import pytest
+
+from demand import parse_demand
+
+
+def _answer(*prices, direction="increasing"):
+    return json.dumps({direction: [
+        {"crop": f"Crop {i}", "price": price, "analysis": "why"} for i, price in enumerate(prices)
+    ]})
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (48.5, 48.5),
+    (12, 12.0),
+    ("₱1,234.50", 1234.5),
+    ("PHP 85", 85.0),
+    ("Php2,000", 2000.0),
+    ("19.999", 20.0),
+])
+def test_prices_are_cleaned_and_rounded(raw, expected):
+    document = parse_demand(_answer(raw))
+    assert document["increasing"][0]["price"] == expected
+    assert document["decreasing"] == []
+
+
+@pytest.mark.parametrize("raw", ["nan", "NaN", "inf", "-Infinity", "1e20", 1e10, -5, "", "cheap", True, None])
+def test_unusable_prices_drop_only_their_entry(raw):
+    document = parse_demand(_answer(raw, 30))
+    assert [entry["price"] for entry in document["increasing"]] == [30.0]
+
+
+def test_nan_literal_from_the_model_is_dropped():
+    # json.loads accepts a bare NaN, which JSONB would reject at insert time
+    text = '{"increasing": [{"crop": "Rice", "price": NaN}, {"crop": "Corn", "price": 20}]}'
+    document = parse_demand(text)
+    assert [entry["crop"] for entry in document["increasing"]] == ["Corn"]
+    json.dumps(document, allow_nan=False)
+
+
+def test_largest_storable_price_is_kept():
+    assert parse_demand(_answer("9,999,999,999.99"))["increasing"][0]["price"] == 9999999999.99
+
+
+def test_code_fences_are_stripped():
+    text = "```json\n" + _answer(10, direction="decreasing") + "\n```"
+    assert parse_demand(text)["decreasing"][0]["price"] == 10.0
+
+
+def test_nothing_usable_raises():
+    with pytest.raises(ValueError):
+        parse_demand(_answer("nan", "inf"))
+    with pytest.raises(ValueError):
+        parse_demand("not json")
+    with pytest.raises(ValueError):
+        parse_demand("[]")
@@ -0,0 +1,36 @@
+"""validate_log(): log_date must carry an offset and is stored as UTC."""
+import pytest
+
+from log_ingest import validate_log
+
+LOG_DATE = -1
+
+
+def _log(**fields):
+    return dict({"plant": "Tomato"}, **fields)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("2025-05-01T08:00:00+08:00", "2025-05-01T00:00:00+00:00"),
+    ("2025-05-01T00:00:00Z", "2025-05-01T00:00:00+00:00"),
+    ("2025-04-30T19:30:00-04:30", "2025-05-01T00:00:00+00:00"),
+    ("2025-05-01T08:00:00.250+08:00", "2025-05-01T00:00:00.250000+00:00"),
+])
+def test_offset_timestamps_are_converted_to_utc(raw, expected):
+    assert validate_log(_log(log_date=raw))[LOG_DATE] == expected
+
+
+def test_missing_log_date_defaults_to_now_in_sql():
+    assert validate_log(_log())[LOG_DATE] is None
+
+
+@pytest.mark.parametrize("raw", ["2025-05-01T08:00:00", "2025-05-01"])
+def test_naive_timestamps_are_rejected(raw):
+    with pytest.raises(ValueError, match="UTC offset"):
+        validate_log(_log(log_date=raw))
+
+
+@pytest.mark.parametrize("raw", ["yesterday", "2025-13-01T00:00:00Z", ""])
+def test_invalid_timestamps_are_rejected(raw):
+    with pytest.raises(ValueError, match="ISO 8601"):
+        validate_log(_log(log_date=raw))
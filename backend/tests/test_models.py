@@ -0,0 +1,128 @@
+"""Breaker, fast-fail, fallback and retry-after behaviour of models.generate() against FakeModel."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+api_exceptions = pytest.importorskip("google.api_core.exceptions")
+
+import fake_gemini  # noqa: E402
+import governor  # noqa: E402
+import models  # noqa: E402
+
+THRESHOLD = 3
+COOLDOWN = 0.2
+
+
+def _reset():
+    models.routes.cache_clear()
+    models._clients.clear()
+    governor._governors.clear()
+
+
+@pytest.fixture(autouse=True)
+def fake_routes(monkeypatch):
+    monkeypatch.setenv("GEMINI_FAKE", "1")
+    monkeypatch.setenv("FAKE_GEMINI_LATENCY", "0")
+    monkeypatch.setenv("FAKE_GEMINI_JITTER", "0")
+    monkeypatch.setenv("FAKE_GEMINI_FAILURE_RATE", "0")
+    monkeypatch.setenv("FAKE_GEMINI_429_RATE", "0")
+    monkeypatch.setenv("LLM_MAX_RETRIES", "0")
+    monkeypatch.setenv("LLM_BREAKER_THRESHOLD", str(THRESHOLD))
+    monkeypatch.setenv("LLM_BREAKER_COOLDOWN", str(COOLDOWN))
+    monkeypatch.setenv("MODEL_ROUTES", json.dumps({
+        "probe": {"model": "primary", "fallback": "secondary", "timeout": 5},
+        "solo": {"model": "solo", "fallback": None, "timeout": 5},
+    }))
+    _reset()
+    yield
+    _reset()
+
+
+def _count_calls(client):
+    calls = []
+    generate_content = client.generate_content
+
+    def counting(*args, **kwargs):
+        calls.append(args)
+        return generate_content(*args, **kwargs)
+
+    client.generate_content = counting
+    return calls
+
+
+def _open_breaker(task, model_name):
+    """Fail `task` on its only model until the breaker opens."""
+    models.get_client(model_name).failure_rate = 1.0
+    for _ in range(THRESHOLD):
+        with pytest.raises(api_exceptions.ServiceUnavailable):
+            models.generate(task, "hello")
+
+
+def test_breaker_opens_after_threshold_failures(monkeypatch):
+    monkeypatch.setenv("FAKE_GEMINI_FAILURE_RATE", "1")
+    breaker = governor.get_governor("solo").breaker
+    for _ in range(THRESHOLD):
+        assert breaker.state == "closed"
+        with pytest.raises(api_exceptions.ServiceUnavailable):
+            models.generate("solo", "hello")
+    assert breaker.state == "open"
+
+
+def test_open_circuit_fails_fast_without_calling_the_model():
+    _open_breaker("solo", "solo")
+    calls = _count_calls(models.get_client("solo"))
+
+    started = time.monotonic()
+    with pytest.raises(governor.CircuitOpen):
+        models.generate("solo", "hello")
+    assert calls == []
+    assert time.monotonic() - started < COOLDOWN
+
+
+def test_falls_back_to_secondary_model_when_primary_fails():
+    models.get_client("primary").failure_rate = 1.0
+    secondary_calls = _count_calls(models.get_client("secondary"))
+
+    response = models.generate("probe", "hello")
+    assert response.text == fake_gemini.DEFAULT_TEXT
+    assert len(secondary_calls) == 1
+
+
+def test_open_primary_goes_straight_to_fallback():
+    models.get_client("primary").failure_rate = 1.0
+    for _ in range(THRESHOLD):
+        models.generate("probe", "hello")
+    assert governor.get_governor("primary").breaker.state == "open"
+    primary_calls = _count_calls(models.get_client("primary"))
+    secondary_calls = _count_calls(models.get_client("secondary"))
+
+    models.generate("probe", "hello")
+    assert primary_calls == []
+    assert len(secondary_calls) == 1
+
+
+def test_retry_after_is_honored():
+    _open_breaker("solo", "solo")
+    with pytest.raises(governor.CircuitOpen) as excinfo:
+        models.generate("solo", "hello")
+    wait = excinfo.value.retry_after
+    assert 0 < wait <= COOLDOWN
+    # What the routes send as the Retry-After header: whole seconds, at least one
+    assert governor.retry_after(excinfo.value) == 1
+
+    models.get_client("solo").failure_rate = 0.0
+    time.sleep(wait)
+    assert models.generate("solo", "hello").text == fake_gemini.DEFAULT_TEXT
+    assert governor.get_governor("solo").breaker.state == "closed"
+
+
+def test_fake_gemini_is_not_imported_unless_enabled(monkeypatch):
+    monkeypatch.setenv("GEMINI_FAKE", "0")
+    probe = "import sys, models; print('fake_gemini' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True,
+                            cwd=os.path.dirname(models.__file__), check=True)
+    assert result.stdout.strip() == "False"
@@ -0,0 +1,62 @@
+"""Keyset cursors for /get_news: round-trip, and tampered cursors rejected with a 400."""
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from pagination import MAX_PAGE_SIZE, decode_cursor, encode_cursor, parse_limit
+
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2025, 5, 1, 8, 30, 15, 123456),
+    datetime(2025, 1, 1),
+])
+def test_cursor_round_trip(created_at):
+    cursor = encode_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, 42)
+
+
+def _b64(raw):
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    encode_cursor(datetime(2025, 5, 1), 42)[:-3],
+    _b64(json.dumps(["2025-05-01T00:00:00"]).encode()),
+    _b64(json.dumps(["yesterday", 42]).encode()),
+    _b64(json.dumps(["2025-05-01T00:00:00", "forty-two"]).encode()),
+    _b64(b"\xff\xfe"),
+])
+def test_tampered_cursors_raise(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_limit_is_clamped():
+    assert parse_limit(None) == parse_limit("") == 20
+    assert parse_limit(str(MAX_PAGE_SIZE * 10)) == MAX_PAGE_SIZE
+    for bad in ("0", "-1", "ten"):
+        with pytest.raises(ValueError):
+            parse_limit(bad)
+
+
+@pytest.fixture
+def client():
+    pytest.importorskip("flask_cors")
+    import app
+    from flask import Flask
+
+    # Just the routes: no .env, Gemini client or migrations
+    flask_app = Flask(__name__)
+    flask_app.register_blueprint(app.api)
+    return flask_app.test_client()
+
+
+@pytest.mark.parametrize("query", ["cursor=not-a-cursor", "limit=0", "limit=ten"])
+def test_get_news_rejects_bad_page_arguments(client, query):
+    response = client.get("/get_news?" + query)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
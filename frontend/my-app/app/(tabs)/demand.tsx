@@ -38,7 +38,18 @@ const TopCrops: React.FC = () => {
                     throw new Error(`HTTP error! status: ${response.status}`);
 
                 const temp = await response.json();
-                // Determine the string payload (handles both temp.response and temp.json keys)
+                // The server now sends the parsed lists directly
+                if (
+                    Array.isArray(temp.increasing) ||
+                    Array.isArray(temp.decreasing)
+                ) {
+                    setCropData({
+                        increasing: temp.increasing ?? [],
+                        decreasing: temp.decreasing ?? [],
+                    });
+                    return;
+                }
+                // Older rows: determine the string payload (handles both temp.response and temp.json keys)
                 let payloadStr: string;
                 if (temp.response && typeof temp.response === "string") {
                     payloadStr = temp.response;